@@ -1,5 +1,5 @@
 from .textbook import build_tree_from_middle_json, enrich_tree_with_llm
 from .toc import build_toc, align_titles
-from .rag import index_tree_into_lancedb
+from .rag import index_tree_into_lancedb, index_node_into_lancedb
 from .formatters import tree_to_markdown
 from .workbook import segment_questions, bind_questions_to_tree
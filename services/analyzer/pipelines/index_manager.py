@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List
+
+import lancedb
+
+from services.common.lancedb_utils import index_stat
+
+from .rag import FTS_COLUMNS, _ensure_fts_indexes, _ensure_scalar_index
+
+
+VECTOR_TABLES = ("text_chunks", "table_summaries")
+VECTOR_INDEX_TYPES = {"IVF_PQ", "IVF_HNSW_PQ", "IVF_HNSW_SQ", "IVF_FLAT"}
+
+
+def _vector_index(table):
+    for idx in table.list_indices():
+        if "vector" in idx.columns and str(idx.index_type).upper() in VECTOR_INDEX_TYPES:
+            return idx
+    return None
+
+
+def _create_vector_index(table, rows: int, rag_cfg: Dict[str, Any]) -> None:
+    index_type = str(rag_cfg.get("index_type", "IVF_PQ")).upper()
+    num_partitions = rag_cfg.get("index_num_partitions") or max(1, int(math.sqrt(rows)))
+    kwargs: Dict[str, Any] = {
+        "metric": rag_cfg.get("index_metric", "l2"),
+        "num_partitions": int(num_partitions),
+        "vector_column_name": "vector",
+        "index_type": index_type,
+        "replace": True,
+    }
+    if index_type.endswith("PQ"):
+        dim = table.schema.field("vector").type.list_size
+        kwargs["num_sub_vectors"] = int(rag_cfg.get("index_num_sub_vectors") or max(1, dim // 16))
+    table.create_index(**kwargs)
+
+
+def maintain_table_indexes(table, rag_cfg: Dict[str, Any]) -> Dict[str, Any]:
+    rows = table.count_rows()
+    result: Dict[str, Any] = {"rows": rows, "action": "none"}
+    if not rows:
+        return result
+
+    _ensure_scalar_index(table, "doc_id", rag_cfg.get("doc_id_index_type", "BTREE"))
+    idx = _vector_index(table)
+    if idx is None:
+        # IVF 训练需要足够样本，行数不足时暴力扫描反而更快
+        if rows >= int(rag_cfg.get("index_min_rows", 100000)):
+            _create_vector_index(table, rows, rag_cfg)
+            result["action"] = "created"
+    else:
+        unindexed = int(index_stat(table.index_stats(idx.name), "num_unindexed_rows") or 0)
+        result["unindexed_rows"] = unindexed
+        if unindexed / rows >= float(rag_cfg.get("index_rebuild_ratio", 0.2)):
+            # 大量新增数据会使聚类中心失真，整体重建而非增量合并
+            _create_vector_index(table, rows, rag_cfg)
+            result["action"] = "rebuilt"
+
+    # 增量合并 doc_id 标量索引、全文索引以及向量索引中的未索引行
+    if result["action"] == "none" and any(
+        index_stat(table.index_stats(other.name), "num_unindexed_rows") for other in table.list_indices()
+    ):
+        table.optimize()
+        result["action"] = "optimized"
+    return result
+
+
+def maintain_indexes(config: Dict[str, Any]) -> Dict[str, Any]:
+    db = lancedb.connect(config["storage"]["lancedb_path"])
+    rag_cfg = config.get("rag", {})
+    names = set(db.table_names())
+    report: Dict[str, Any] = {}
+    for name in VECTOR_TABLES:
+        if name not in names:
+            continue
+        table = db.open_table(name)
+        report[name] = maintain_table_indexes(table, rag_cfg)
+        fts_columns: List[str] = FTS_COLUMNS.get(name, [])
+        if fts_columns and table.count_rows():
+            _ensure_fts_indexes(table, fts_columns, rag_cfg)
+    return report
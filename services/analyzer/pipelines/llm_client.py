@@ -10,8 +10,10 @@ from pathlib import Path
 import requests
 import time
 
+from services.common.metrics import EMBEDDING_LATENCY, FAILURES, LLM_LATENCY, RETRIES, observe
 
-def _post_json(url: str, api_key: str, payload: Dict[str, Any], timeout: int = 60, retries: int = 1, backoff_s: int = 2) -> Dict[str, Any]:
+
+def _post_json(url: str, api_key: str, payload: Dict[str, Any], timeout: int = 60, retries: int = 1, backoff_s: int = 2, operation: str = "http") -> Dict[str, Any]:
     headers = {"Content-Type": "application/json"}
     if api_key:
         headers["Authorization"] = f"Bearer {api_key}"
@@ -24,19 +26,22 @@ def _post_json(url: str, api_key: str, payload: Dict[str, Any], timeout: int = 6
         except requests.exceptions.RequestException as exc:
             last_error = exc
             if attempt < retries:
+                RETRIES.labels(operation).inc()
                 time.sleep(backoff_s * attempt)
             continue
+    FAILURES.labels(operation).inc()
     raise last_error if last_error else RuntimeError("request failed")
 
 
-def _chat_complete(base_url: str, api_key: str, model: str, messages: List[Dict[str, Any]], temperature: float = 0.2, timeout: int = 60, retries: int = 1, backoff_s: int = 2) -> str:
+def _chat_complete(base_url: str, api_key: str, model: str, messages: List[Dict[str, Any]], temperature: float = 0.2, timeout: int = 60, retries: int = 1, backoff_s: int = 2, prompt_key: str = "default") -> str:
     url = base_url.rstrip("/") + "/chat/completions"
     payload = {
         "model": model,
         "messages": messages,
         "temperature": temperature,
     }
-    data = _post_json(url, api_key, payload, timeout=timeout, retries=retries, backoff_s=backoff_s)
+    with observe(LLM_LATENCY, prompt_key):
+        data = _post_json(url, api_key, payload, timeout=timeout, retries=retries, backoff_s=backoff_s, operation=f"llm:{prompt_key}")
     return data["choices"][0]["message"]["content"]
 
 
@@ -80,6 +85,7 @@ def extract_knowledge(text: str, config: Dict[str, Any], node_type: str | None =
         timeout=int(llm_cfg.get("request_timeout_s", 120)),
         retries=int(llm_cfg.get("max_retries", 3)),
         backoff_s=int(llm_cfg.get("retry_backoff_s", 5)),
+        prompt_key=prompt_key,
     )
     payload = _safe_json(content)
     return {
@@ -109,6 +115,7 @@ def extract_toc_from_text(text: str, config: Dict[str, Any]) -> List[Dict[str, A
         timeout=int(llm_cfg.get("request_timeout_s", 120)),
         retries=int(llm_cfg.get("max_retries", 3)),
         backoff_s=int(llm_cfg.get("retry_backoff_s", 5)),
+        prompt_key="toc_text",
     )
     payload = _safe_json(content)
     return payload.get("items", [])
@@ -139,6 +146,7 @@ def extract_toc_from_images(image_paths: List[str], config: Dict[str, Any]) -> L
         timeout=int(config.get("models", {}).get("llm", {}).get("request_timeout_s", 120)),
         retries=int(config.get("models", {}).get("llm", {}).get("max_retries", 3)),
         backoff_s=int(config.get("models", {}).get("llm", {}).get("retry_backoff_s", 5)),
+        prompt_key="toc_images",
     )
     payload = _safe_json(content)
     if isinstance(payload, list):
@@ -166,6 +174,7 @@ def extract_toc_from_image_page(image_data_url: str, config: Dict[str, Any]) ->
         timeout=int(config.get("models", {}).get("llm", {}).get("request_timeout_s", 120)),
         retries=int(config.get("models", {}).get("llm", {}).get("max_retries", 3)),
         backoff_s=int(config.get("models", {}).get("llm", {}).get("retry_backoff_s", 5)),
+        prompt_key="toc_images_page",
     )
     payload = _safe_json(content)
     if isinstance(payload, list):
@@ -193,6 +202,7 @@ def align_toc_llm(nodes: List[Dict[str, Any]], toc_items: List[Dict[str, Any]],
         timeout=int(llm_cfg.get("request_timeout_s", 120)),
         retries=int(llm_cfg.get("max_retries", 3)),
         backoff_s=int(llm_cfg.get("retry_backoff_s", 5)),
+        prompt_key="toc_align",
     )
     data = _safe_json(content)
     return data.get("mappings", [])
@@ -218,6 +228,7 @@ def segment_questions_llm(blocks: List[Dict[str, Any]], config: Dict[str, Any])
         timeout=int(llm_cfg.get("request_timeout_s", 120)),
         retries=int(llm_cfg.get("max_retries", 3)),
         backoff_s=int(llm_cfg.get("retry_backoff_s", 5)),
+        prompt_key="question_segment",
     )
     data = _safe_json(content)
     return data.get("questions", [])
@@ -243,6 +254,7 @@ def bind_questions_llm(questions: List[Dict[str, Any]], tree: Dict[str, Any], co
         timeout=int(llm_cfg.get("request_timeout_s", 120)),
         retries=int(llm_cfg.get("max_retries", 3)),
         backoff_s=int(llm_cfg.get("retry_backoff_s", 5)),
+        prompt_key="question_bind",
     )
     data = _safe_json(content)
     return data.get("bindings", [])
@@ -267,14 +279,16 @@ def embed_texts(texts: List[str], config: Dict[str, Any]) -> List[List[float]]:
     for i in range(0, len(cleaned), max_batch):
         batch = cleaned[i : i + max_batch]
         payload = {"model": embed_cfg["model_name"], "input": batch}
-        data = _post_json(
-            url,
-            embed_cfg["api_key"],
-            payload,
-            timeout=int(config.get("models", {}).get("llm", {}).get("request_timeout_s", 120)),
-            retries=int(config.get("models", {}).get("llm", {}).get("max_retries", 3)),
-            backoff_s=int(config.get("models", {}).get("llm", {}).get("retry_backoff_s", 5)),
-        )
+        with observe(EMBEDDING_LATENCY, "analyzer"):
+            data = _post_json(
+                url,
+                embed_cfg["api_key"],
+                payload,
+                timeout=int(config.get("models", {}).get("llm", {}).get("request_timeout_s", 120)),
+                retries=int(config.get("models", {}).get("llm", {}).get("max_retries", 3)),
+                backoff_s=int(config.get("models", {}).get("llm", {}).get("retry_backoff_s", 5)),
+                operation="embedding",
+            )
         vectors.extend([item["embedding"] for item in data.get("data", [])])
 
     return vectors
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class ProgressCounter:
+    def __init__(
+        self,
+        total: int,
+        concurrency: int = 1,
+        on_flush: Optional[Callable[[Dict[str, Any]], None]] = None,
+        flush_interval_s: float = 2.0,
+    ) -> None:
+        self.total = total
+        self.concurrency = max(1, concurrency)
+        self.on_flush = on_flush
+        self.flush_interval_s = flush_interval_s
+        self.analyzed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.in_flight = 0
+        self._latency_total = 0.0
+        self._latency_count = 0
+        self._started_at = time.time()
+        self._last_progress_at = self._started_at
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def start(self) -> float:
+        with self._lock:
+            self.in_flight += 1
+        return time.monotonic()
+
+    def finish(self, started: float, ok: bool) -> None:
+        latency = time.monotonic() - started
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.analyzed += 1
+            else:
+                self.failed += 1
+            self._latency_total += latency
+            self._latency_count += 1
+            self._last_progress_at = time.time()
+        self.flush()
+
+    def skip(self) -> None:
+        with self._lock:
+            self.skipped += 1
+            self._last_progress_at = time.time()
+        self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.analyzed + self.failed + self.skipped
+            avg_latency = self._latency_total / self._latency_count if self._latency_count else None
+            now = time.time()
+            return {
+                "total": self.total,
+                "analyzed": self.analyzed,
+                "failed": self.failed,
+                "skipped": self.skipped,
+                "in_flight": self.in_flight,
+                "done": done,
+                "avg_latency_s": round(avg_latency, 3) if avg_latency is not None else None,
+                # 按观测到的单节点耗时与并发度估算剩余时间
+                "eta_s": round((self.total - done) * avg_latency / self.concurrency, 1) if avg_latency is not None else None,
+                "elapsed_s": round(now - self._started_at, 1),
+                "idle_s": round(now - self._last_progress_at, 1),
+            }
+
+    def flush(self, force: bool = False) -> None:
+        if self.on_flush is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval_s:
+            return
+        # 回调可能涉及 IO，只允许一个线程执行，其余线程直接跳过
+        if not self._flush_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_flush = now
+            self.on_flush(self.snapshot())
+        finally:
+            self._flush_lock.release()
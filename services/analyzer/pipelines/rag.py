@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import json
+import logging
 from typing import Any, Dict, List
 
 import lancedb
 import pyarrow as pa
 
+from services.common.lancedb_utils import sql_literal
+from services.common.progress import get_redis_client
+
 from .llm_client import embed_texts
 
 
+FTS_COLUMNS = {"text_chunks": ["text", "knowledge_points"]}
+
+logger = logging.getLogger(__name__)
+
+
 def chunk_text(text: str, size: int, overlap: int) -> List[str]:
     if not text:
         return []
@@ -35,10 +45,43 @@ def _ensure_table(db, name: str, schema: pa.Schema):
     return db.create_table(name, schema=schema)
 
 
-def index_tree_into_lancedb(tree: Dict[str, Any], config: Dict[str, Any]) -> None:
-    if not config.get("rag", {}).get("enable", True):
+def _ensure_scalar_index(table, column: str, index_type: str = "BTREE") -> None:
+    if any(tuple(idx.columns) == (column,) for idx in table.list_indices()):
+        return
+    table.create_scalar_index(column, index_type=index_type, replace=True)
+
+
+def _ensure_fts_indexes(table, columns: List[str], rag_cfg: Dict[str, Any]) -> None:
+    existing = {tuple(idx.columns) for idx in table.list_indices()}
+    for column in columns:
+        if (column,) in existing:
+            continue
+        # 中文无空格分词，使用 n-gram 切分以支持公式与术语精确检索
+        table.create_fts_index(
+            column,
+            use_tantivy=False,
+            replace=True,
+            with_position=False,
+            base_tokenizer=rag_cfg.get("fts_tokenizer", "ngram"),
+            ngram_min_length=int(rag_cfg.get("fts_ngram_min", 2)),
+            ngram_max_length=int(rag_cfg.get("fts_ngram_max", 3)),
+            lower_case=True,
+        )
+
+
+def notify_index_updated(doc_ids: List[str], config: Dict[str, Any]) -> None:
+    channel = config.get("cache", {}).get("answer", {}).get("invalidation_channel", "edu:index_updated")
+    client = get_redis_client()
+    if client is None:
         return
+    try:
+        client.publish(channel, json.dumps({"doc_ids": doc_ids}))
+    except Exception:
+        # 失效通知尽力而为，网关缓存仍会按 TTL 过期
+        logger.warning("failed to publish index update for %s", doc_ids, exc_info=True)
 
+
+def _open_tables(config: Dict[str, Any]):
     db = lancedb.connect(config["storage"]["lancedb_path"])
     dim = config["models"]["embedding"]["dimension"]
 
@@ -63,19 +106,60 @@ def index_tree_into_lancedb(tree: Dict[str, Any], config: Dict[str, Any]) -> Non
         ]
     )
 
-    text_table = _ensure_table(db, "text_chunks", text_schema)
-    table_table = _ensure_table(db, "table_summaries", table_schema)
+    return _ensure_table(db, "text_chunks", text_schema), _ensure_table(db, "table_summaries", table_schema)
+
 
+def index_tree_into_lancedb(tree: Dict[str, Any], config: Dict[str, Any]) -> None:
+    if not config.get("rag", {}).get("enable", True):
+        return
+
+    text_table, table_table = _open_tables(config)
     doc_id = tree.get("doc_id", "")
     if doc_id:
-        text_table.delete(f"doc_id = '{doc_id}'")
-        table_table.delete(f"doc_id = '{doc_id}'")
+        text_table.delete(f"doc_id = {sql_literal(doc_id)}")
+        table_table.delete(f"doc_id = {sql_literal(doc_id)}")
+
+    try:
+        _add_node_records(list(_iter_nodes(tree.get("nodes", []))), doc_id, text_table, table_table, config)
+        doc_index_type = config["rag"].get("doc_id_index_type", "BTREE")
+        for table in (text_table, table_table):
+            if table.count_rows():
+                _ensure_scalar_index(table, "doc_id", doc_index_type)
+        if text_table.count_rows():
+            _ensure_fts_indexes(text_table, FTS_COLUMNS["text_chunks"], config["rag"])
+    finally:
+        # 旧向量已删除，无论新数据是否写入成功都要通知网关失效语义缓存
+        if doc_id:
+            notify_index_updated([doc_id], config)
+
+
+def index_node_into_lancedb(doc_id: str, node: Dict[str, Any], config: Dict[str, Any]) -> None:
+    if not config.get("rag", {}).get("enable", True):
+        return
 
+    text_table, table_table = _open_tables(config)
+    # 只替换该节点自身的分块，子节点的向量保持不变
+    node_filter = f"doc_id = {sql_literal(doc_id)} AND node_id = {sql_literal(node.get('node_id'))}"
+    text_table.delete(node_filter)
+    table_table.delete(node_filter)
+    try:
+        _add_node_records([node], doc_id, text_table, table_table, config)
+    finally:
+        notify_index_updated([doc_id], config)
+
+
+def _add_node_records(
+    nodes: List[Dict[str, Any]],
+    doc_id: str,
+    text_table,
+    table_table,
+    config: Dict[str, Any],
+) -> None:
     chunk_size = config["rag"]["chunk_size"]
     overlap = config["rag"]["chunk_overlap"]
 
     text_records: List[Dict[str, Any]] = []
-    for node in _iter_nodes(tree.get("nodes", [])):
+    for node in nodes:
         raw_text = "\n".join(node.get("raw_text", []))
         knowledge_points = ""
         if isinstance(node.get("analysis"), dict):
@@ -101,8 +185,8 @@ def index_tree_into_lancedb(tree: Dict[str, Any], config: Dict[str, Any]) -> Non
             return
 
     table_records: List[Dict[str, Any]] = []
-    for node in _iter_nodes(tree.get("nodes", [])):
-        for table in node.get("content_refs", {}).get("tables", []):
+    for node in nodes:
+        for table in (node.get("content_refs") or {}).get("tables", []):
             html = table.get("html") or ""
             summary = html[:500]
             table_records.append(
@@ -2,13 +2,14 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Tuple
 
 from .llm_client import extract_knowledge
+from .progress_counter import ProgressCounter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from .toc import build_toc, align_titles, align_titles_with_llm
 from .patcher import build_tree_from_toc
-from .rag import index_tree_into_lancedb
+from .rag import index_node_into_lancedb, index_tree_into_lancedb
 
 
 TITLE_TYPES = {"TITLE", "TITLE_BLOCK"}
@@ -132,42 +133,59 @@ def _iter_nodes(node_list: List[Dict[str, Any]]):
             yield from _iter_nodes(node["children"])
 
 
-def enrich_tree_with_llm(tree: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+def enrich_tree_with_llm(
+    tree: Dict[str, Any],
+    config: Dict[str, Any],
+    on_progress: Callable[[Dict[str, Any]], None] | None = None,
+) -> Dict[str, Any]:
     nodes = [n for n in _iter_nodes(tree["nodes"])]
-    max_workers = int(config.get("pipeline", {}).get("llm_concurrency", 2))
-    stats = {"analyzed": 0, "failed": 0, "skipped": 0}
+    pipeline_cfg = config.get("pipeline", {})
+    max_workers = int(pipeline_cfg.get("llm_concurrency", 2))
+    progress = ProgressCounter(
+        len(nodes),
+        concurrency=max_workers,
+        on_flush=on_progress,
+        flush_interval_s=float(pipeline_cfg.get("progress_interval_s", 2.0)),
+    )
 
     def _analyze(node: Dict[str, Any]):
-        if node.get("analysis"):
-            stats["skipped"] += 1
-            return node
-        text = "\n".join(node.get("raw_text", []))
-        if not text:
-            stats["skipped"] += 1
+        if node.get("analysis") or not _node_text(node):
+            progress.skip()
             return node
-        try:
-            node["analysis"] = extract_knowledge(text, config, node.get("type"), node.get("title"))
-            node["status"] = "analyzed"
-            stats["analyzed"] += 1
-        except Exception as exc:
-            node["analysis"] = {"error": str(exc)}
-            node["status"] = "failed"
-            stats["failed"] += 1
+        started = progress.start()
+        node.update(analyze_node(node, config))
+        progress.finish(started, ok=node["status"] == "analyzed")
         return node
 
     if max_workers <= 1:
         for node in nodes:
             _analyze(node)
-        return tree
-
-    with ThreadPoolExecutor(max_workers=max_workers) as ex:
-        futures = [ex.submit(_analyze, n) for n in nodes]
-        for _ in as_completed(futures):
-            pass
-    tree["analysis_summary"] = stats
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            futures = [ex.submit(_analyze, n) for n in nodes]
+            for _ in as_completed(futures):
+                pass
+    progress.flush(force=True)
+    summary = progress.snapshot()
+    tree["analysis_summary"] = {k: summary[k] for k in ("total", "analyzed", "failed", "skipped", "elapsed_s")}
     return tree
 
 
+def _node_text(node: Dict[str, Any]) -> str:
+    return "\n".join(node.get("raw_text") or [])
+
+
+def analyze_node(node: Dict[str, Any], config: Dict[str, Any]) -> Dict[str, Any]:
+    # 返回需写回节点的 analysis/status 字段；无正文时返回空字典
+    text = _node_text(node)
+    if not text:
+        return {}
+    try:
+        return {"analysis": extract_knowledge(text, config, node.get("type"), node.get("title")), "status": "analyzed"}
+    except Exception as exc:
+        return {"analysis": {"error": str(exc)}, "status": "failed"}
+
+
 def apply_toc_correction(tree: Dict[str, Any], middle_json: Dict[str, Any], output_dir: Path, config: Dict[str, Any], pdf_path: str | None = None) -> Dict[str, Any]:
     toc_items, source = build_toc(middle_json, output_dir, config, pdf_path)
     tree["toc"] = {"source": source, "items": toc_items}
@@ -193,6 +211,10 @@ def index_tree(tree: Dict[str, Any], config: Dict[str, Any]) -> None:
     index_tree_into_lancedb(tree, config)
 
 
+def index_node(doc_id: str, node: Dict[str, Any], config: Dict[str, Any]) -> None:
+    index_node_into_lancedb(doc_id, node, config)
+
+
 def save_tree(tree: Dict[str, Any], output_path: Path) -> None:
     output_path.write_text(
         json.dumps(tree, ensure_ascii=False, indent=2),
@@ -1,16 +1,21 @@
 from __future__ import annotations
 
 import json
+import logging
 import os
-import sqlite3
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict
-from datetime import datetime
+from typing import Any, Dict, Mapping
 
-import yaml
 from celery import Celery
 from dotenv import load_dotenv
 
+from services.common.config import get_config
+from services.common.metrics import STAGE_LATENCY, install_celery_metrics, observe
+from services.common.progress import publish_progress
+from services.common.status_store import get_status_store
+from services.common.tree_store import get_tree_store
+
 from .pipelines import (
     build_tree_from_middle_json,
     enrich_tree_with_llm,
@@ -18,7 +23,7 @@ from .pipelines import (
     segment_questions,
     bind_questions_to_tree,
 )
-from .pipelines.textbook import apply_toc_correction, index_tree
+from .pipelines.textbook import analyze_node, apply_toc_correction, index_node, index_tree
 from .pipelines.content_align import fill_tree_content
 from .pipelines.llm_client import segment_questions_llm, bind_questions_llm
 
@@ -26,74 +31,25 @@ from .pipelines.llm_client import segment_questions_llm, bind_questions_llm
 load_dotenv()
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 celery_app = Celery("edu_analyzer", broker=redis_url, backend=redis_url)
+install_celery_metrics(celery_app, int(os.getenv("METRICS_PORT", "9102")))
 
+logger = logging.getLogger(__name__)
 
-def _resolve_env(value: Any) -> Any:
-    if isinstance(value, str):
-        return os.path.expandvars(value)
-    if isinstance(value, list):
-        return [_resolve_env(item) for item in value]
-    if isinstance(value, dict):
-        return {k: _resolve_env(v) for k, v in value.items()}
-    return value
-
-
-def load_config() -> Dict[str, Any]:
-    config_path = os.getenv("CONFIG_PATH", "./config/config.yaml")
-    data = yaml.safe_load(Path(config_path).read_text(encoding="utf-8")) or {}
-    data = _resolve_env(data)
-    return _resolve_paths(data, Path(config_path))
-
-
-def _resolve_paths(data: Dict[str, Any], config_path: Path) -> Dict[str, Any]:
-    base_dir = config_path.resolve().parent.parent
-    storage = data.get("storage", {})
-    for key in ("base_path", "lancedb_path", "sqlite_path"):
-        if key in storage and isinstance(storage[key], str):
-            p = Path(storage[key])
-            if not p.is_absolute():
-                storage[key] = str((base_dir / p).resolve())
-    data["storage"] = storage
 
-    toc = data.get("toc", {})
-    if isinstance(toc.get("poppler_path"), str):
-        p = Path(toc["poppler_path"])
-        if not p.is_absolute():
-            toc["poppler_path"] = str((base_dir / p).resolve())
-    data["toc"] = toc
-    return data
+def load_config(overrides: Mapping[str, Any] | None = None) -> Mapping[str, Any]:
+    # 项目级覆盖项由网关随任务下发
+    return get_config(overrides=overrides)
 
 
 def _update_document_status(config: Dict[str, Any], doc_id: str, **fields: Any) -> None:
-    sqlite_path = config["storage"].get("sqlite_path", "./data/sqlite/app.db")
-    Path(sqlite_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(sqlite_path)
-    try:
-        fields["updated_at"] = datetime.utcnow().isoformat()
-        columns = ", ".join([f"{key}=?" for key in fields.keys()])
-        values = list(fields.values()) + [doc_id]
-        conn.execute(f"UPDATE documents SET {columns} WHERE id=?", values)
-        conn.commit()
-    finally:
-        conn.close()
+    get_status_store(config).update(doc_id, **fields)
+    publish_progress(doc_id, **fields)
 
 
-def _upsert_tree(config: Dict[str, Any], doc_id: str, tree_json: str) -> None:
-    sqlite_path = config["storage"].get("sqlite_path", "./data/sqlite/app.db")
-    Path(sqlite_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(sqlite_path)
-    try:
-        conn.execute(
-            "CREATE TABLE IF NOT EXISTS document_trees (doc_id TEXT PRIMARY KEY, tree_json TEXT, updated_at TEXT)"
-        )
-        conn.execute(
-            "INSERT INTO document_trees (doc_id, tree_json, updated_at) VALUES (?, ?, ?) "
-            "ON CONFLICT(doc_id) DO UPDATE SET tree_json=excluded.tree_json, updated_at=excluded.updated_at",
-            (doc_id, tree_json, datetime.utcnow().isoformat()),
-        )
-        conn.commit()
-    finally:
-        conn.close()
+def _report_progress(config: Dict[str, Any], doc_id: str, snapshot: Dict[str, Any]) -> None:
+    # 节点级进度合并写库，同时推送给订阅者
+    get_status_store(config).update_progress(doc_id, progress_json=json.dumps(snapshot))
+    publish_progress(doc_id, progress=snapshot)
 
 
 def locate_middle_json(output_dir: Path) -> Path | None:
@@ -106,8 +62,11 @@ def locate_middle_json(output_dir: Path) -> Path | None:
 
 
 @celery_app.task(name="analyze_task")
-def analyze_task(doc_id: str, node_id: str | None = None):
-    config = load_config()
+def analyze_task(doc_id: str, node_id: str | None = None, config_overrides: Dict[str, Any] | None = None):
+    if node_id:
+        # 兼容旧版网关按 analyze_task 下发的单节点重算
+        return regenerate_node_task(doc_id, node_id, config_overrides)
+    config = load_config(config_overrides)
     _update_document_status(config, doc_id, status="analyzing", last_step="analyze", error_message="")
     base_path = Path(config["storage"]["base_path"])
     output_dir = base_path / doc_id / config["mineru"]["output_subdir"]
@@ -153,26 +112,28 @@ def analyze_task(doc_id: str, node_id: str | None = None):
             tree = apply_toc_correction(tree, middle_json, output_dir, config, pdf_path)
         tree = fill_tree_content(tree, middle_json, 0.8)
         # 先落盘结构化树（未填充分析）
+        tree_store = get_tree_store(config)
         tree_path = base_path / doc_id / "knowledge_tree.json"
-        tree_json = json.dumps(tree, ensure_ascii=False, indent=2)
-        tree_path.write_text(tree_json, encoding="utf-8")
-        _upsert_tree(config, doc_id, tree_json)
+        tree_store.save_tree(doc_id, tree)
+        tree_store.materialize(doc_id, tree_path)
+        _update_document_status(config, doc_id, has_tree=1)
 
         # 再做 LLM 分析填充
-        tree = enrich_tree_with_llm(tree, config)
-        index_tree(tree, config)
+        with observe(STAGE_LATENCY, "analyze.enrich"):
+            tree = enrich_tree_with_llm(tree, config, on_progress=partial(_report_progress, config, doc_id))
+        with observe(STAGE_LATENCY, "analyze.index"):
+            index_tree(tree, config)
+
+        # 分析结果只更新节点的 analysis/status 两列，再整体物化一次快照
+        tree_store.update_analysis(doc_id, tree)
+        tree_store.materialize(doc_id, tree_path)
+
+        md_path = base_path / doc_id / "knowledge_tree.md"
+        md_path.write_text(tree_to_markdown(tree), encoding="utf-8")
     except Exception as exc:
         _update_document_status(config, doc_id, status="failed", last_step="analyze", error_message=str(exc))
         raise
 
-    tree_path = base_path / doc_id / "knowledge_tree.json"
-    tree_json = json.dumps(tree, ensure_ascii=False, indent=2)
-    tree_path.write_text(tree_json, encoding="utf-8")
-    _upsert_tree(config, doc_id, tree_json)
-
-    md_path = base_path / doc_id / "knowledge_tree.md"
-    md_path.write_text(tree_to_markdown(tree), encoding="utf-8")
-
     summary = tree.get("analysis_summary", {})
     status = "completed"
     if summary.get("failed"):
@@ -184,13 +145,67 @@ def analyze_task(doc_id: str, node_id: str | None = None):
         last_step="analyze",
         error_message="",
         result_path=str(tree_path),
+        has_tree=1,
     )
+    try:
+        celery_app.send_task("maintain_indexes", queue="analyze_task")
+    except Exception:
+        # 索引维护只是优化，投递失败不影响本次分析结果
+        logger.warning("failed to schedule maintain_indexes after analyzing %s", doc_id, exc_info=True)
     return {"doc_id": doc_id, "status": "completed", "tree_path": str(tree_path)}
 
 
+@celery_app.task(name="regenerate_node_task")
+def regenerate_node_task(doc_id: str, node_id: str, config_overrides: Dict[str, Any] | None = None):
+    config = load_config(config_overrides)
+    tree_store = get_tree_store(config)
+    tree_path = Path(config["storage"]["base_path"]) / doc_id / "knowledge_tree.json"
+    if not tree_store.ensure_imported(doc_id, tree_path):
+        return {"doc_id": doc_id, "node_id": node_id, "status": "missing_tree"}
+    node = tree_store.get_node(doc_id, node_id)
+    if node is None:
+        return {"doc_id": doc_id, "node_id": node_id, "status": "missing_node"}
+
+    fields = analyze_node(node, config)
+    if not fields:
+        return {"doc_id": doc_id, "node_id": node_id, "status": "skipped"}
+    previous = node.get("analysis")
+    if fields["status"] == "failed" and previous and "error" not in previous:
+        # 重算失败时保留原有的有效分析结果，只上报失败
+        error = fields["analysis"].get("error", "")
+        publish_progress(doc_id, node_id=node_id, node_status="failed", node_error=error)
+        return {"doc_id": doc_id, "node_id": node_id, "status": "failed", "error": error}
+    # 只改写这一行再重建快照，不重跑整本书
+    node = tree_store.update_node(doc_id, node_id, fields)
+    tree_store.materialize(doc_id, tree_path)
+    index_node(doc_id, node, config)
+    publish_progress(doc_id, node_id=node_id, node_status=node["status"], node_version=node["version"])
+    return {"doc_id": doc_id, "node_id": node_id, "status": node["status"], "version": node["version"]}
+
+
+@celery_app.task(name="maintain_indexes")
+def maintain_indexes_task():
+    import redis
+
+    from .pipelines.index_manager import maintain_indexes
+
+    # 多本书同时完成时只需一次维护，其余任务直接跳过
+    lock = redis.Redis.from_url(redis_url).lock("edu:index_maintenance", timeout=3600, blocking=False)
+    if not lock.acquire():
+        return {"status": "skipped"}
+    try:
+        return {"status": "completed", "tables": maintain_indexes(load_config())}
+    finally:
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            # 维护耗时超过锁超时后锁已过期或被其他任务持有，无需释放
+            logger.warning("index maintenance lock expired before release")
+
+
 @celery_app.task(name="toc_precheck")
-def toc_precheck(doc_id: str, pdf_path: str):
-    config = load_config()
+def toc_precheck(doc_id: str, pdf_path: str, config_overrides: Dict[str, Any] | None = None):
+    config = load_config(config_overrides)
     toc_cfg = config.get("toc", {})
     if not toc_cfg.get("enable", True) or not toc_cfg.get("use_vlm", True):
         return {"doc_id": doc_id, "status": "skipped"}
@@ -241,8 +256,8 @@ def toc_precheck(doc_id: str, pdf_path: str):
 
 
 @celery_app.task(name="workbook_task")
-def workbook_task(workbook_id: str, target_doc_id: str):
-    config = load_config()
+def workbook_task(workbook_id: str, target_doc_id: str, config_overrides: Dict[str, Any] | None = None):
+    config = load_config(config_overrides)
     _update_document_status(config, workbook_id, status="binding", last_step="workbook_bind", error_message="")
     base_path = Path(config["storage"]["base_path"])
     output_dir = base_path / workbook_id / config["mineru"]["output_subdir"]
@@ -268,6 +283,7 @@ def workbook_task(workbook_id: str, target_doc_id: str):
             questions = segment_questions(blocks)
 
         tree_path = base_path / target_doc_id / "knowledge_tree.json"
+        get_tree_store(config).materialize_if_dirty(target_doc_id, tree_path)
         if not tree_path.exists():
             _update_document_status(config, workbook_id, status="failed", last_step="workbook_bind", error_message="missing tree")
             return {"workbook_id": workbook_id, "status": "missing_tree"}
@@ -0,0 +1 @@
+from .config import get_config, load_config_dict, invalidate_config, publish_config_reload
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Tuple
+
+import yaml
+
+RELOAD_CHANNEL = "edu:config_reload"
+
+_lock = threading.Lock()
+# 缓存：(配置文件路径, 覆盖项摘要) -> ((mtime_ns, size), 冻结快照)
+_cache: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], Mapping[str, Any]]]" = OrderedDict()
+_MAX_ENTRIES = 64
+_listener_pid: int | None = None
+
+
+def _deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    result = dict(base)
+    for key, value in override.items():
+        if (
+            key in result
+            and isinstance(result[key], dict)
+            and isinstance(value, dict)
+        ):
+            result[key] = _deep_merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def _resolve_env(value: Any) -> Any:
+    if isinstance(value, str):
+        return os.path.expandvars(value)
+    if isinstance(value, list):
+        return [_resolve_env(item) for item in value]
+    if isinstance(value, dict):
+        return {k: _resolve_env(v) for k, v in value.items()}
+    return value
+
+
+def _resolve_paths(data: Dict[str, Any], config_path: Path) -> Dict[str, Any]:
+    base_dir = config_path.resolve().parent.parent
+    storage = data.get("storage", {})
+    # 网关与解析 Worker 都经此解析，未配置时给出同一默认值，保证两边指向同一目录
+    storage.setdefault("parse_cache_path", "./data/parse_cache")
+    for key in ("base_path", "lancedb_path", "sqlite_path", "parse_cache_path"):
+        if key in storage and isinstance(storage[key], str):
+            p = Path(storage[key])
+            if not p.is_absolute():
+                storage[key] = str((base_dir / p).resolve())
+    data["storage"] = storage
+
+    toc = data.get("toc", {})
+    if isinstance(toc.get("poppler_path"), str):
+        p = Path(toc["poppler_path"])
+        if not p.is_absolute():
+            toc["poppler_path"] = str((base_dir / p).resolve())
+    data["toc"] = toc
+    return data
+
+
+def freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def _config_path(path: str | None) -> Path:
+    return Path(path or os.getenv("CONFIG_PATH", "./config/config.yaml"))
+
+
+def load_config_dict(path: str | None = None, overrides: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    config_path = _config_path(path)
+    data: Dict[str, Any] = {}
+    if config_path.exists():
+        data = yaml.safe_load(config_path.read_text(encoding="utf-8")) or {}
+
+    if overrides:
+        data = _deep_merge(data, overrides)
+
+    data = _resolve_env(data)
+    return _resolve_paths(data, config_path)
+
+
+def _signature(config_path: Path) -> Tuple[int, int]:
+    try:
+        stat = config_path.stat()
+    except FileNotFoundError:
+        return (0, 0)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _overrides_key(overrides: Mapping[str, Any] | None) -> str:
+    if not overrides:
+        return ""
+    raw = json.dumps(thaw(overrides), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def get_config(path: str | None = None, overrides: Mapping[str, Any] | None = None) -> Mapping[str, Any]:
+    _ensure_listener()
+    config_path = _config_path(path)
+    key = (str(config_path.resolve()), _overrides_key(overrides))
+    signature = _signature(config_path)
+    cached = _cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == signature:
+            _cache.move_to_end(key)
+            return cached[1]
+        snapshot = freeze(load_config_dict(str(config_path), thaw(overrides) if overrides else None))
+        _cache[key] = (signature, snapshot)
+        _cache.move_to_end(key)
+        while len(_cache) > _MAX_ENTRIES:
+            _cache.popitem(last=False)
+        return snapshot
+
+
+def invalidate_config() -> None:
+    with _lock:
+        _cache.clear()
+
+
+def publish_config_reload(redis_url: str | None = None) -> None:
+    import redis
+
+    client = redis.Redis.from_url(redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    client.publish(RELOAD_CHANNEL, json.dumps({"reload": True}))
+
+
+def _ensure_listener() -> None:
+    global _listener_pid
+    # Celery prefork 子进程不继承父进程线程，按进程各自启动监听
+    if _listener_pid == os.getpid():
+        return
+    with _lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+    redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    def run() -> None:
+        try:
+            import redis
+        except ImportError:
+            return
+
+        while True:
+            try:
+                pubsub = redis.Redis.from_url(redis_url).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(RELOAD_CHANNEL)
+                for _ in pubsub.listen():
+                    invalidate_config()
+            except Exception:
+                time.sleep(5)
+
+    threading.Thread(target=run, name="config-reload-listener", daemon=True).start()
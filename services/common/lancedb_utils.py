@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import re
+from typing import Any, Iterable
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def sql_literal(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def in_filter(field: str, values: Iterable[str]) -> str:
+    if not _IDENTIFIER.match(field):
+        raise ValueError(f"invalid filter field: {field}")
+    literals = sorted({sql_literal(v) for v in values})
+    if not literals:
+        raise ValueError("empty filter values")
+    if len(literals) == 1:
+        return f"{field} = {literals[0]}"
+    return f"{field} IN ({', '.join(literals)})"
+
+
+def index_stat(stats: Any, name: str) -> Any:
+    # 不同版本的 lancedb 中 index_stats 返回 dict 或对象
+    if isinstance(stats, dict):
+        return stats.get(name)
+    return getattr(stats, name, None)
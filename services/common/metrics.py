@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Tuple
+
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+try:
+    import prometheus_client
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client import multiprocess
+except Exception:  # pragma: no cover
+    prometheus_client = None
+
+
+class _NoopMetric:
+    def labels(self, *args: Any, **kwargs: Any) -> "_NoopMetric":
+        return self
+
+    def observe(self, value: float) -> None:
+        pass
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+
+def _histogram(name: str, doc: str, labels: Tuple[str, ...], buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return Histogram(name, doc, labels, buckets=buckets)
+
+
+def _counter(name: str, doc: str, labels: Tuple[str, ...]):
+    if prometheus_client is None:
+        return _NoopMetric()
+    return Counter(name, doc, labels)
+
+
+EMBEDDING_LATENCY = _histogram("edu_embedding_latency_seconds", "Embedding API latency", ("service",))
+SEARCH_LATENCY = _histogram("edu_search_latency_seconds", "LanceDB search latency", ("table", "kind"))
+LLM_LATENCY = _histogram("edu_llm_latency_seconds", "Chat completion latency", ("prompt_key",))
+PARSE_SECONDS_PER_PAGE = _histogram(
+    "edu_mineru_parse_seconds_per_page", "MinerU parse duration divided by page count", ("backend",)
+)
+STAGE_LATENCY = _histogram("edu_stage_latency_seconds", "Pipeline stage duration", ("stage",), STAGE_BUCKETS)
+QUEUE_WAIT = _histogram("edu_task_queue_wait_seconds", "Time between task publish and start", ("task",), STAGE_BUCKETS)
+TASK_LATENCY = _histogram("edu_task_latency_seconds", "Celery task run time", ("task",), STAGE_BUCKETS)
+RETRIES = _counter("edu_retries_total", "Retried operations", ("operation",))
+FAILURES = _counter("edu_failures_total", "Failed operations", ("operation",))
+
+
+@contextmanager
+def observe(metric, *labels: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.labels(*labels).observe(time.perf_counter() - started)
+
+
+def _registry():
+    # 多进程（uvicorn/celery prefork）下需从共享目录聚合各子进程的指标
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def render_latest() -> Tuple[bytes, str]:
+    if prometheus_client is None:
+        return b"# prometheus_client not installed\n", "text/plain; charset=utf-8"
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def install_celery_metrics(celery_app, exporter_port: int | None = None) -> None:
+    from celery import signals
+
+    @signals.before_task_publish.connect(weak=False)
+    def _stamp_publish(headers=None, **_: Any) -> None:
+        if headers is not None:
+            headers.setdefault("published_at", time.time())
+
+    if exporter_port is None:
+        return
+
+    starts: dict[str, float] = {}
+
+    @signals.task_prerun.connect(weak=False)
+    def _on_prerun(task_id=None, task=None, **_: Any) -> None:
+        published_at = getattr(task.request, "published_at", None)
+        if published_at:
+            QUEUE_WAIT.labels(task.name).observe(max(0.0, time.time() - float(published_at)))
+        starts[task_id] = time.perf_counter()
+
+    @signals.task_postrun.connect(weak=False)
+    def _on_postrun(task_id=None, task=None, **_: Any) -> None:
+        started = starts.pop(task_id, None)
+        if started is not None:
+            TASK_LATENCY.labels(task.name).observe(time.perf_counter() - started)
+
+    @signals.task_retry.connect(weak=False)
+    def _on_retry(sender=None, **_: Any) -> None:
+        RETRIES.labels(f"task:{getattr(sender, 'name', 'unknown')}").inc()
+
+    @signals.task_failure.connect(weak=False)
+    def _on_failure(sender=None, **_: Any) -> None:
+        FAILURES.labels(f"task:{getattr(sender, 'name', 'unknown')}").inc()
+
+    @signals.worker_init.connect(weak=False)
+    def _start_exporter(**_: Any) -> None:
+        if prometheus_client is not None:
+            prometheus_client.start_http_server(exporter_port, registry=_registry())
+
+    @signals.worker_process_shutdown.connect(weak=False)
+    def _mark_dead(pid=None, **_: Any) -> None:
+        if prometheus_client is not None and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List
+
+CHANNEL_PREFIX = "edu:progress:doc:"
+CHANNEL_PATTERN = CHANNEL_PREFIX + "*"
+SNAPSHOT_PREFIX = "edu:progress:snapshot:"
+SNAPSHOT_TTL_S = 86400
+# 新一轮任务开始时清空快照，避免上一轮的进度字段被重放给订阅者
+RUN_START_STATUSES = {"parsing", "analyzing", "binding"}
+
+_client = None
+_client_pid: int | None = None
+
+
+def progress_channel(doc_id: str) -> str:
+    return f"{CHANNEL_PREFIX}{doc_id}"
+
+
+def snapshot_key(doc_id: str) -> str:
+    return f"{SNAPSHOT_PREFIX}{doc_id}"
+
+
+def get_redis_client():
+    global _client, _client_pid
+    if _client_pid == os.getpid():
+        return _client
+    _client_pid = os.getpid()
+    try:
+        import redis
+    except ImportError:
+        _client = None
+        return None
+    _client = redis.Redis.from_url(
+        os.getenv("REDIS_URL", "redis://localhost:6379/0"), socket_timeout=0.5, socket_connect_timeout=0.5
+    )
+    return _client
+
+
+def publish_progress(doc_id: str, **fields: Any) -> None:
+    client = get_redis_client()
+    if client is None:
+        return
+    event = {"doc_id": doc_id, **fields, "ts": time.time()}
+    key = snapshot_key(doc_id)
+    try:
+        # 快照与事件同批写入，晚到的订阅者先读快照再接增量
+        pipe = client.pipeline(transaction=False)
+        if fields.get("status") in RUN_START_STATUSES:
+            pipe.delete(key)
+        pipe.hset(key, mapping={k: json.dumps(v, ensure_ascii=False, default=str) for k, v in event.items()})
+        pipe.expire(key, SNAPSHOT_TTL_S)
+        pipe.publish(progress_channel(doc_id), json.dumps(event, ensure_ascii=False, default=str))
+        pipe.execute()
+    except Exception:
+        # 进度推送尽力而为，不能影响任务本身
+        pass
+
+
+def read_snapshots(client, doc_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    ids: List[str] = list(doc_ids)
+    pipe = client.pipeline(transaction=False)
+    for doc_id in ids:
+        pipe.hgetall(snapshot_key(doc_id))
+    snapshots: Dict[str, Dict[str, Any]] = {}
+    for doc_id, raw in zip(ids, pipe.execute()):
+        if raw:
+            snapshots[doc_id] = {
+                (k.decode("utf-8") if isinstance(k, bytes) else k): json.loads(v) for k, v in raw.items()
+            }
+    return snapshots
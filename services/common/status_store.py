@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Mapping, Tuple
+
+DEFAULT_SQLITE_PATH = "./data/sqlite/app.db"
+
+_stores: Dict[Tuple[int, str], "StatusStore"] = {}
+_stores_lock = threading.Lock()
+
+
+def configure_connection(conn) -> None:
+    # WAL 允许网关读与 Worker 写并发；NORMAL 在 WAL 下只在检查点时 fsync
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+
+class StatusStore:
+    def __init__(self, sqlite_path: str, flush_interval_s: float = 1.0) -> None:
+        self.sqlite_path = sqlite_path
+        self.flush_interval_s = flush_interval_s
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        # doc_id -> 待写入字段，高频进度更新在此合并
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher: threading.Thread | None = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.sqlite_path, timeout=30, check_same_thread=False, isolation_level=None)
+            configure_connection(conn)
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            yield self._connection()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        # IMMEDIATE 在事务开始即取得写锁，避免读后升级写锁时的死锁重试
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _write(self, updates: Mapping[str, Dict[str, Any]]) -> None:
+        with self.transaction() as conn:
+            for doc_id, fields in updates.items():
+                columns = ", ".join([f"{key}=?" for key in fields.keys()])
+                conn.execute(f"UPDATE documents SET {columns} WHERE id=?", [*fields.values(), doc_id])
+
+    def update(self, doc_id: str, **fields: Any) -> None:
+        # 状态变更立即落库，并顺带写出该文档尚未刷新的进度，保证先后顺序
+        with self._pending_lock:
+            pending = self._pending.pop(doc_id, {})
+        fields = {**pending, **fields, "updated_at": datetime.utcnow().isoformat()}
+        self._write({doc_id: fields})
+
+    def update_progress(self, doc_id: str, **fields: Any) -> None:
+        with self._pending_lock:
+            self._pending.setdefault(doc_id, {}).update(fields, updated_at=datetime.utcnow().isoformat())
+        self._ensure_flusher()
+
+    def flush(self) -> None:
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self._write(pending)
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._pending_lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+
+            def run() -> None:
+                while not self._wakeup.wait(self.flush_interval_s):
+                    try:
+                        self.flush()
+                    except sqlite3.Error:
+                        continue
+
+            self._flusher = threading.Thread(target=run, name="status-store-flush", daemon=True)
+            self._flusher.start()
+
+    def close(self) -> None:
+        self._wakeup.set()
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+
+def get_status_store(config: Mapping[str, Any]) -> StatusStore:
+    sqlite_path = str(config["storage"].get("sqlite_path", DEFAULT_SQLITE_PATH))
+    # 连接不能跨 fork 复用，prefork 子进程各自持有一条长连接
+    key = (os.getpid(), sqlite_path)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                store = StatusStore(sqlite_path, float(config.get("pipeline", {}).get("status_flush_interval_s", 1.0)))
+                _stores[key] = store
+    return store
+
+
+@atexit.register
+def _close_stores() -> None:
+    for (pid, _), store in list(_stores.items()):
+        if pid == os.getpid():
+            try:
+                store.close()
+            except sqlite3.Error:
+                pass
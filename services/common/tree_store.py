@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .status_store import StatusStore, get_status_store
+
+# 拆成独立列的节点字段，其余字段整体存入 body_json
+NODE_COLUMNS = ("title", "level", "status", "analysis", "content_refs")
+JSON_COLUMNS = {"analysis", "content_refs"}
+READONLY_FIELDS = {"node_id", "parent_id", "children", "version"}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS tree_nodes ("
+    "doc_id TEXT NOT NULL, node_id TEXT NOT NULL, parent_id TEXT, position INTEGER NOT NULL, "
+    "title TEXT, level INTEGER, status TEXT, analysis TEXT, content_refs TEXT, body_json TEXT, "
+    "version INTEGER NOT NULL DEFAULT 1, updated_at TEXT, PRIMARY KEY (doc_id, node_id))",
+    "CREATE INDEX IF NOT EXISTS ix_tree_nodes_parent ON tree_nodes (doc_id, parent_id, position)",
+    "CREATE TABLE IF NOT EXISTS tree_meta ("
+    "doc_id TEXT PRIMARY KEY, meta_json TEXT, version INTEGER NOT NULL DEFAULT 0, "
+    "snapshot_version INTEGER NOT NULL DEFAULT 0, updated_at TEXT)",
+)
+
+_stores: Dict[Tuple[int, str], "TreeStore"] = {}
+_stores_lock = threading.Lock()
+
+
+class NodeNotFound(Exception):
+    pass
+
+
+class TreeVersionConflict(Exception):
+    def __init__(self, version: int) -> None:
+        super().__init__(f"version conflict, current version is {version}")
+        self.version = version
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _column_value(name: str, value: Any) -> Any:
+    return _dumps(value) if name in JSON_COLUMNS and value is not None else value
+
+
+class TreeStore:
+    def __init__(self, status_store: StatusStore) -> None:
+        self.status_store = status_store
+        self._schema_ready = False
+
+    def _ensure_schema(self, conn) -> None:
+        if self._schema_ready:
+            return
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        self._schema_ready = True
+
+    def _bump_version(self, conn, doc_id: str, expected: Optional[int] = None) -> int:
+        row = conn.execute("SELECT version FROM tree_meta WHERE doc_id=?", (doc_id,)).fetchone()
+        current = row[0] if row else 0
+        if expected is not None and expected != current:
+            raise TreeVersionConflict(current)
+        if row is None:
+            conn.execute(
+                "INSERT INTO tree_meta (doc_id, meta_json, version, snapshot_version, updated_at) VALUES (?, '{}', 1, 0, ?)",
+                (doc_id, _now()),
+            )
+        else:
+            conn.execute("UPDATE tree_meta SET version=?, updated_at=? WHERE doc_id=?", (current + 1, _now(), doc_id))
+        return current + 1
+
+    def save_tree(self, doc_id: str, tree: Dict[str, Any], expected_version: Optional[int] = None) -> int:
+        rows: List[Tuple[Any, ...]] = []
+        seen: set[str] = set()
+        now = _now()
+
+        def walk(nodes: List[Dict[str, Any]], parent_id: Optional[str]) -> None:
+            for position, node in enumerate(nodes):
+                node_id = str(node.get("node_id"))
+                if node_id in seen:
+                    # 旧版解析可能产生重复 node_id，追加序号保证主键唯一
+                    node_id = f"{node_id}~{len(seen)}"
+                    node["node_id"] = node_id
+                seen.add(node_id)
+                body = {k: v for k, v in node.items() if k not in NODE_COLUMNS and k not in READONLY_FIELDS}
+                rows.append(
+                    (doc_id, node_id, parent_id, position)
+                    + tuple(_column_value(name, node.get(name)) for name in NODE_COLUMNS)
+                    + (_dumps(body), now)
+                )
+                walk(node.get("children") or [], node_id)
+
+        walk(tree.get("nodes", []), None)
+        meta = {k: v for k, v in tree.items() if k not in ("nodes", "version")}
+        with self.status_store.transaction() as conn:
+            self._ensure_schema(conn)
+            version = self._bump_version(conn, doc_id, expected_version)
+            conn.execute("DELETE FROM tree_nodes WHERE doc_id=?", (doc_id,))
+            conn.executemany(
+                "INSERT INTO tree_nodes (doc_id, node_id, parent_id, position, title, level, status, analysis, "
+                "content_refs, body_json, updated_at, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row + (version,) for row in rows],
+            )
+            conn.execute("UPDATE tree_meta SET meta_json=? WHERE doc_id=?", (_dumps(meta), doc_id))
+        return version
+
+    def update_analysis(self, doc_id: str, tree: Dict[str, Any]) -> int:
+        rows: List[Tuple[Any, ...]] = []
+        now = _now()
+
+        def walk(nodes: List[Dict[str, Any]]) -> None:
+            for node in nodes:
+                rows.append((_column_value("analysis", node.get("analysis")), node.get("status"), now, node.get("node_id")))
+                walk(node.get("children") or [])
+
+        walk(tree.get("nodes", []))
+        with self.status_store.transaction() as conn:
+            self._ensure_schema(conn)
+            version = self._bump_version(conn, doc_id)
+            conn.executemany(
+                "UPDATE tree_nodes SET analysis=?, status=?, updated_at=?, version=? WHERE doc_id=? AND node_id=?",
+                [row[:3] + (version, doc_id, row[3]) for row in rows],
+            )
+            if "analysis_summary" in tree:
+                self._merge_meta(conn, doc_id, {"analysis_summary": tree["analysis_summary"]})
+        return version
+
+    def _merge_meta(self, conn, doc_id: str, meta: Mapping[str, Any]) -> None:
+        row = conn.execute("SELECT meta_json FROM tree_meta WHERE doc_id=?", (doc_id,)).fetchone()
+        merged = {**json.loads(row[0] or "{}"), **meta} if row else dict(meta)
+        conn.execute("UPDATE tree_meta SET meta_json=? WHERE doc_id=?", (_dumps(merged), doc_id))
+
+    def update_node(
+        self,
+        doc_id: str,
+        node_id: str,
+        fields: Mapping[str, Any],
+        expected_version: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        with self.status_store.transaction() as conn:
+            self._ensure_schema(conn)
+            row = conn.execute(
+                "SELECT body_json, version FROM tree_nodes WHERE doc_id=? AND node_id=?", (doc_id, node_id)
+            ).fetchone()
+            if row is None:
+                raise NodeNotFound(node_id)
+            if expected_version is not None and row[1] != expected_version:
+                raise TreeVersionConflict(row[1])
+            version = self._bump_version(conn, doc_id)
+            body = json.loads(row[0] or "{}")
+            assignments = {"version": version, "updated_at": _now()}
+            for key, value in fields.items():
+                if key in READONLY_FIELDS:
+                    continue
+                if key in NODE_COLUMNS:
+                    assignments[key] = _column_value(key, value)
+                else:
+                    body[key] = value
+            assignments["body_json"] = _dumps(body)
+            columns = ", ".join(f"{key}=?" for key in assignments)
+            conn.execute(
+                f"UPDATE tree_nodes SET {columns} WHERE doc_id=? AND node_id=?",
+                [*assignments.values(), doc_id, node_id],
+            )
+        return self.get_node(doc_id, node_id)
+
+    def _row_to_node(self, row: Tuple[Any, ...]) -> Dict[str, Any]:
+        node_id, parent_id, title, level, status, analysis, content_refs, body_json, version = row
+        node = {"node_id": node_id, "title": title, "level": level, "status": status}
+        node.update(json.loads(body_json or "{}"))
+        node["content_refs"] = json.loads(content_refs) if content_refs else None
+        node["analysis"] = json.loads(analysis) if analysis else None
+        node["parent_id"] = parent_id
+        node["version"] = version
+        return node
+
+    def get_node(self, doc_id: str, node_id: str) -> Optional[Dict[str, Any]]:
+        with self.status_store.connection() as conn:
+            self._ensure_schema(conn)
+            row = conn.execute(
+                "SELECT node_id, parent_id, title, level, status, analysis, content_refs, body_json, version "
+                "FROM tree_nodes WHERE doc_id=? AND node_id=?",
+                (doc_id, node_id),
+            ).fetchone()
+        return self._row_to_node(row) if row else None
+
+    def build_tree(self, doc_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        with self.status_store.connection() as conn:
+            self._ensure_schema(conn)
+            meta_row = conn.execute("SELECT meta_json, version FROM tree_meta WHERE doc_id=?", (doc_id,)).fetchone()
+            if meta_row is None:
+                return 0, None
+            rows = conn.execute(
+                "SELECT node_id, parent_id, title, level, status, analysis, content_refs, body_json, version "
+                "FROM tree_nodes WHERE doc_id=? ORDER BY position",
+                (doc_id,),
+            ).fetchall()
+        children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            node = self._row_to_node(row)
+            children.setdefault(node.pop("parent_id"), []).append(node)
+        for siblings in children.values():
+            for node in siblings:
+                node["children"] = children.get(node["node_id"], [])
+        tree = json.loads(meta_row[0] or "{}")
+        tree["version"] = meta_row[1]
+        tree["nodes"] = children.get(None, [])
+        return meta_row[1], tree
+
+    def materialize(self, doc_id: str, tree_path: Path) -> bool:
+        tree_path.parent.mkdir(parents=True, exist_ok=True)
+        for _ in range(3):
+            version, tree = self.build_tree(doc_id)
+            if tree is None:
+                return False
+            tmp = tree_path.with_name(f"{tree_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(_dumps(tree), encoding="utf-8")
+            try:
+                # 替换文件时持有写锁：并发的物化与写入都被串行化，旧版本不会覆盖新快照
+                with self.status_store.transaction() as conn:
+                    row = conn.execute(
+                        "SELECT version, snapshot_version FROM tree_meta WHERE doc_id=?", (doc_id,)
+                    ).fetchone()
+                    if row is None:
+                        return False
+                    if row[0] == version:
+                        if row[1] < version or not tree_path.exists():
+                            os.replace(tmp, tree_path)
+                            conn.execute("UPDATE tree_meta SET snapshot_version=? WHERE doc_id=?", (version, doc_id))
+                        return True
+            finally:
+                tmp.unlink(missing_ok=True)
+            # 构建期间有新写入，按最新版本重建
+        return False
+
+    def materialize_if_dirty(self, doc_id: str, tree_path: Path) -> bool:
+        with self.status_store.connection() as conn:
+            self._ensure_schema(conn)
+            row = conn.execute("SELECT version, snapshot_version FROM tree_meta WHERE doc_id=?", (doc_id,)).fetchone()
+        if row is None or (row[0] <= row[1] and tree_path.exists()):
+            return False
+        return self.materialize(doc_id, tree_path)
+
+    def ensure_imported(self, doc_id: str, tree_path: Path) -> bool:
+        # 历史文档只有快照文件，首次按节点修改时导入节点表
+        with self.status_store.connection() as conn:
+            self._ensure_schema(conn)
+            exists = conn.execute("SELECT 1 FROM tree_meta WHERE doc_id=?", (doc_id,)).fetchone()
+        if exists:
+            return True
+        if not tree_path.exists():
+            return False
+        self.save_tree(doc_id, json.loads(tree_path.read_text(encoding="utf-8")), expected_version=0)
+        return True
+
+    def delete(self, doc_id: str) -> None:
+        with self.status_store.transaction() as conn:
+            self._ensure_schema(conn)
+            conn.execute("DELETE FROM tree_nodes WHERE doc_id=?", (doc_id,))
+            conn.execute("DELETE FROM tree_meta WHERE doc_id=?", (doc_id,))
+
+
+def get_tree_store(config: Mapping[str, Any]) -> TreeStore:
+    status_store = get_status_store(config)
+    key = (os.getpid(), status_store.sqlite_path)
+    store = _stores.get(key)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(key, TreeStore(status_store))
+    return store
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def _scope_key(doc_ids: Optional[Iterable[str]]) -> Optional[frozenset]:
+    if not doc_ids:
+        return None
+    return frozenset(doc_ids)
+
+
+class SemanticAnswerCache:
+    def __init__(self, max_entries: int = 256, threshold: float = 0.95, ttl_s: int = 86400) -> None:
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        # 每条记录：(scope, 检索参数, 归一化向量, 答案, 写入时间)；检索参数含 mode、top_k 等影响命中集合的项
+        self._entries: List[Tuple[Optional[frozenset], Hashable, np.ndarray, Dict[str, Any], float]] = []
+        self._matrix: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if not vec.size or norm == 0.0:
+            return None
+        return vec / norm
+
+    def _rebuild_matrix(self) -> None:
+        self._matrix = np.stack([e[2] for e in self._entries]) if self._entries else None
+
+    def _evict_expired(self) -> None:
+        deadline = time.monotonic() - self.ttl_s
+        kept = [e for e in self._entries if e[4] >= deadline]
+        if len(kept) != len(self._entries):
+            self._entries = kept
+            self._rebuild_matrix()
+
+    def lookup(self, embedding: List[float], doc_ids: Optional[List[str]], params: Hashable) -> Optional[Dict[str, Any]]:
+        vec = self._normalize(embedding)
+        if vec is None:
+            return None
+        scope = _scope_key(doc_ids)
+        with self._lock:
+            self._evict_expired()
+            if self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+                self.misses += 1
+                return None
+            sims = self._matrix @ vec
+            for idx in np.argsort(-sims):
+                if sims[idx] < self.threshold:
+                    break
+                entry_scope, entry_params, _, answer, _ = self._entries[idx]
+                if entry_scope == scope and entry_params == params:
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+            return None
+
+    def store(self, embedding: List[float], doc_ids: Optional[List[str]], params: Hashable, answer: Dict[str, Any]) -> None:
+        vec = self._normalize(embedding)
+        if vec is None:
+            return
+        with self._lock:
+            self._entries.append((_scope_key(doc_ids), params, vec, answer, time.monotonic()))
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries :]
+            self._rebuild_matrix()
+
+    def invalidate_docs(self, doc_ids: Iterable[str]) -> int:
+        changed = set(doc_ids)
+        with self._lock:
+            # 未限定范围的查询可能命中任意文档，一并失效
+            kept = [e for e in self._entries if e[0] is not None and not (e[0] & changed)]
+            removed = len(self._entries) - len(kept)
+            if removed:
+                self._entries = kept
+                self._rebuild_matrix()
+                self.invalidations += removed
+            return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = []
+            self._matrix = None
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+def start_invalidation_listener(redis_url: str, channel: str, cache: SemanticAnswerCache) -> threading.Thread:
+    import redis
+
+    def run() -> None:
+        while True:
+            try:
+                client = redis.Redis.from_url(redis_url)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(channel)
+                for message in pubsub.listen():
+                    try:
+                        data = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    cache.invalidate_docs(data.get("doc_ids") or [])
+            except Exception:
+                # Redis 断开期间无法感知重建索引，清空避免返回过期答案
+                cache.clear()
+                time.sleep(5)
+
+    thread = threading.Thread(target=run, name="answer-cache-invalidation", daemon=True)
+    thread.start()
+    return thread
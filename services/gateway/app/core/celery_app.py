@@ -4,6 +4,8 @@ import os
 
 from celery import Celery
 
+from services.common.metrics import install_celery_metrics
+
 
 def create_celery() -> Celery:
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -12,4 +14,6 @@ def create_celery() -> Celery:
         broker=redis_url,
         backend=redis_url,
     )
+    # 发布时打上时间戳，Worker 据此统计排队等待时长
+    install_celery_metrics(celery_app)
     return celery_app
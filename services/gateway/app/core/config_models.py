@@ -7,12 +7,14 @@ class StorageConfig(BaseModel):
     base_path: str = Field(default="./data/shared")
     lancedb_path: str = Field(default="./data/lancedb")
     sqlite_path: str = Field(default="./data/sqlite/app.db")
+    parse_cache_path: str = Field(default="./data/parse_cache")
 
 
 class GatewayConfig(BaseModel):
     host: str = "0.0.0.0"
     port: int = 8000
     cors_origins: list[str] = ["http://localhost:3000"]
+    tree_cache_entries: int = 32
 
 
 class LLMConfig(BaseModel):
@@ -47,10 +49,20 @@ class ModelsConfig(BaseModel):
 class MinerUConfig(BaseModel):
     mode: str = "api"
     api_base_url: str = "http://localhost:8002"
+    api_endpoints: list[str] = []
+    api_health_path: str = "/docs"
+    api_health_interval_s: float = 15.0
+    api_breaker_failures: int = 3
+    api_breaker_cooldown_s: float = 60.0
     api_endpoint: str = "/file_parse"
     api_timeout_s: int = 600
     api_download_output: bool = True
     api_response_zip: bool = True
+    api_debug_dump: bool = False
+    shard_pages: int = 0
+    shard_retries: int = 2
+    parse_cache: bool = False
+    version: str = ""
     api_params: dict = {}
     install_path: str = "F:/Model/mineru"
     cli_path: str = "F:/Model/mineru/.venv/Scripts/magic-pdf.exe"
@@ -65,6 +77,8 @@ class PipelineConfig(BaseModel):
     use_llm_segmentation: bool = True
     use_llm_binding: bool = True
     llm_concurrency: int = 2
+    status_flush_interval_s: float = 1.0
+    progress_interval_s: float = 2.0
 
 
 class TocConfig(BaseModel):
@@ -85,6 +99,40 @@ class RagConfig(BaseModel):
     chunk_size: int = 800
     chunk_overlap: int = 100
     top_k: int = 6
+    rrf_k: int = 60
+    fts_tokenizer: str = "ngram"
+    fts_ngram_min: int = 2
+    fts_ngram_max: int = 3
+    table_refresh_interval_s: float = 5.0
+    index_type: str = "IVF_PQ"
+    index_metric: str = "l2"
+    index_min_rows: int = 100000
+    index_rebuild_ratio: float = 0.2
+    index_num_partitions: int | None = None
+    index_num_sub_vectors: int | None = None
+    nprobes: int = 20
+    refine_factor: int | None = None
+    doc_id_index_type: str = "BTREE"
+
+
+class EmbeddingCacheConfig(BaseModel):
+    enable: bool = True
+    max_entries: int = 2048
+    ttl_s: int = 3600
+    redis_url: str | None = None
+
+
+class AnswerCacheConfig(BaseModel):
+    enable: bool = True
+    max_entries: int = 256
+    threshold: float = 0.95
+    ttl_s: int = 86400
+    invalidation_channel: str = "edu:index_updated"
+
+
+class CacheConfig(BaseModel):
+    embedding: EmbeddingCacheConfig = EmbeddingCacheConfig()
+    answer: AnswerCacheConfig = AnswerCacheConfig()
 
 
 class AppConfig(BaseModel):
@@ -95,4 +143,5 @@ class AppConfig(BaseModel):
     pipeline: PipelineConfig
     toc: TocConfig
     rag: RagConfig
+    cache: CacheConfig = CacheConfig()
     prompts: dict = {}
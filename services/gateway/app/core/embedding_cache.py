@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def normalize_query(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_s: int = 3600,
+        redis_url: str | None = None,
+        key_prefix: str = "edu:emb:",
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.key_prefix = key_prefix
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self.redis_errors = 0
+        if redis_url:
+            import redis
+
+            self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def _key(self, model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, vector = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _put_local(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _get_remote(self, key: str) -> Optional[List[float]]:
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(self.key_prefix + key)
+        except Exception:
+            self._count("redis_errors")
+            return None
+        return json.loads(raw) if raw else None
+
+    def _put_remote(self, key: str, vector: List[float]) -> None:
+        if self._redis is None:
+            return
+        try:
+            self._redis.setex(self.key_prefix + key, self.ttl_s, json.dumps(vector))
+        except Exception:
+            self._count("redis_errors")
+
+    def get_or_compute(self, model: str, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        key = self._key(model, text)
+        vector = self._get_local(key)
+        if vector is not None:
+            self._count("hits")
+            return vector
+        vector = self._get_remote(key)
+        if vector is not None:
+            self._count("hits")
+            self._count("redis_hits")
+            self._put_local(key, vector)
+            return vector
+        self._count("misses")
+        vector = compute(text)
+        if vector:
+            self._put_local(key, vector)
+            self._put_remote(key, vector)
+        return vector
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "redis_enabled": self._redis is not None,
+            "redis_hits": self.redis_hits,
+            "redis_errors": self.redis_errors,
+        }
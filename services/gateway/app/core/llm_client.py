@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List
 
 import requests
 
@@ -22,6 +22,33 @@ def chat_complete(base_url: str, api_key: str, model: str, messages: List[Dict[s
     return data["choices"][0]["message"]["content"]
 
 
+def chat_complete_stream(base_url: str, api_key: str, model: str, messages: List[Dict[str, Any]]) -> Iterator[str]:
+    url = base_url.rstrip("/") + "/chat/completions"
+    headers = {"Content-Type": "application/json", "Accept": "text/event-stream"}
+    if api_key:
+        headers["Authorization"] = f"Bearer {api_key}"
+    payload = {"model": model, "messages": messages, "temperature": 0.2, "stream": True}
+    with requests.post(url, headers=headers, json=payload, timeout=60, stream=True) as resp:
+        resp.raise_for_status()
+        for raw in resp.iter_lines():
+            line = raw.decode("utf-8", errors="replace") if raw else ""
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
 def embed_texts(base_url: str, api_key: str, model: str, texts: List[str]) -> List[List[float]]:
     url = base_url.rstrip("/") + "/embeddings"
     payload = {"model": model, "input": texts}
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, Iterable, Set, Tuple
+
+from services.common.progress import CHANNEL_PATTERN, CHANNEL_PREFIX, read_snapshots
+
+TERMINAL_STATUSES = {"parsed", "completed", "completed_with_errors", "failed"}
+
+_Subscriber = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+
+def is_terminal(event: Dict[str, Any]) -> bool:
+    # parsed 之后若已排队自动分析（next_step 非空），流程仍会继续
+    status = event.get("status")
+    return status in TERMINAL_STATUSES and not (status == "parsed" and event.get("next_step"))
+
+
+class ProgressHub:
+    def __init__(self, redis_url: str) -> None:
+        self.redis_url = redis_url
+        self._subs: Dict[str, Set[_Subscriber]] = {}
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._client = None
+
+    def _redis(self):
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(self.redis_url, socket_timeout=1, socket_connect_timeout=1)
+        return self._client
+
+    def _ensure_listener(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # 每个网关进程只占用一条订阅连接，再在进程内扇出给各个 SSE 连接
+            self._thread = threading.Thread(target=self._run, name="progress-hub", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            import redis
+        except ImportError:
+            return
+        while True:
+            try:
+                client = redis.Redis.from_url(self.redis_url)
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(CHANNEL_PATTERN)
+                for message in pubsub.listen():
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode("utf-8")
+                    try:
+                        event = json.loads(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    self._dispatch(channel[len(CHANNEL_PREFIX):], event)
+            except Exception:
+                time.sleep(5)
+
+    def _dispatch(self, doc_id: str, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subs.get(doc_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # 事件循环已关闭，连接随后会自行退订
+                continue
+
+    def subscribe(self, doc_ids: Iterable[str]) -> asyncio.Queue:
+        self._ensure_listener()
+        sub: _Subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            for doc_id in doc_ids:
+                self._subs.setdefault(doc_id, set()).add(sub)
+        return sub[1]
+
+    def unsubscribe(self, doc_ids: Iterable[str], queue: asyncio.Queue) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                subs = self._subs.get(doc_id)
+                if not subs:
+                    continue
+                subs.difference_update({sub for sub in subs if sub[1] is queue})
+                if not subs:
+                    self._subs.pop(doc_id, None)
+
+    def snapshots(self, doc_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        try:
+            return read_snapshots(self._redis(), doc_ids)
+        except Exception:
+            return {}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"docs": len(self._subs), "subscribers": len({id(s[1]) for subs in self._subs.values() for s in subs})}
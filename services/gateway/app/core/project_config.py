@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+from ..db import ProjectConfig, session_scope
+from .config_manager import load_config
+from .config_models import AppConfig
+
+
+class ProjectConfigCache:
+    def __init__(self, session_factory, ttl_s: float = 30.0) -> None:
+        self.session_factory = session_factory
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        # project_id -> (加载时间, 覆盖项, 合并后的配置)
+        self._entries: Dict[str, Tuple[float, Dict[str, Any], AppConfig]] = {}
+
+    def _load(self, project_id: str) -> Dict[str, Any]:
+        with session_scope(self.session_factory) as session:
+            row = (
+                session.query(ProjectConfig)
+                .filter(ProjectConfig.project_id == project_id)
+                .order_by(ProjectConfig.created_at.desc())
+                .first()
+            )
+            return json.loads(row.config_json) if row and row.config_json else {}
+
+    def _entry(self, project_id: str) -> Tuple[float, Dict[str, Any], AppConfig]:
+        now = time.monotonic()
+        entry = self._entries.get(project_id)
+        if entry and now - entry[0] < self.ttl_s:
+            return entry
+        overrides = self._load(project_id)
+        entry = (now, overrides, load_config(overrides=overrides) if overrides else load_config())
+        with self._lock:
+            self._entries[project_id] = entry
+        return entry
+
+    def overrides(self, project_id: str | None) -> Dict[str, Any]:
+        if not project_id:
+            return {}
+        return self._entry(project_id)[1]
+
+    def effective(self, project_id: str) -> AppConfig:
+        return self._entry(project_id)[2]
+
+    def set(self, project_id: str, overrides: Dict[str, Any]) -> AppConfig:
+        # 先校验合并结果，非法覆盖项不落库
+        effective = load_config(overrides=overrides)
+        with session_scope(self.session_factory) as session:
+            row = session.query(ProjectConfig).filter(ProjectConfig.project_id == project_id).first()
+            if row is None:
+                session.add(ProjectConfig(project_id=project_id, config_json=json.dumps(overrides, ensure_ascii=False)))
+            else:
+                row.config_json = json.dumps(overrides, ensure_ascii=False)
+                row.created_at = dt.datetime.utcnow()
+        with self._lock:
+            self._entries[project_id] = (time.monotonic(), overrides, effective)
+        return effective
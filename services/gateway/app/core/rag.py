@@ -1,37 +1,168 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
-from .llm_client import chat_complete, embed_texts, safe_json
+from services.common.lancedb_utils import in_filter, index_stat
+from services.common.metrics import LLM_LATENCY, SEARCH_LATENCY, observe
+
+from .llm_client import chat_complete, chat_complete_stream, embed_texts, safe_json
 
 from pathlib import Path
 import os
 
 
-def _filter_clause(field: str, values: List[str]) -> str:
-    quoted = ",".join([f"'{v}'" for v in values])
-    return f"{field} IN ({quoted})"
+SEARCH_TABLES = {
+    "text_chunks": ["text", "knowledge_points"],
+    "table_summaries": [],
+}
+SEARCH_MODES = ("vector", "fts", "hybrid")
 
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="lancedb-search")
 
-def search_lancedb(db, embedding: List[float], doc_ids: Optional[List[str]], top_k: int) -> List[Dict[str, Any]]:
-    results: List[Dict[str, Any]] = []
-    if "text_chunks" in db.table_names():
-        table = db.open_table("text_chunks")
-        query = table.search(embedding).limit(top_k)
-        if doc_ids:
-            query = query.where(_filter_clause("doc_id", doc_ids))
-        results.extend(query.to_list())
-    if "table_summaries" in db.table_names():
-        table = db.open_table("table_summaries")
-        query = table.search(embedding).limit(top_k)
-        if doc_ids:
-            query = query.where(_filter_clause("doc_id", doc_ids))
-        results.extend(query.to_list())
-    return results
+# 表名 -> (表版本, 已建全文索引的列)；建索引会产生新版本，版本变化即视为失效
+_FTS_COLUMNS: Dict[str, Tuple[int, frozenset]] = {}
+_FTS_COLUMNS_LOCK = threading.Lock()
 
+logger = logging.getLogger(__name__)
 
-def generate_answer(query: str, contexts: List[Dict[str, Any]], config: Dict[str, Any]) -> Dict[str, Any]:
-    llm_cfg = config["models"]["llm"]
+
+def _row_key(table_name: str, row: Dict[str, Any]) -> Tuple[Any, ...]:
+    return (table_name, row.get("doc_id"), row.get("node_id"), row.get("text") or row.get("html_code"))
+
+
+def _rrf_fuse(ranked_lists: List[Tuple[str, List[Dict[str, Any]]]], k: int, top_k: int) -> List[Dict[str, Any]]:
+    scores: Dict[Tuple[Any, ...], float] = {}
+    rows: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+    for table_name, results in ranked_lists:
+        for rank, row in enumerate(results):
+            key = _row_key(table_name, row)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            rows.setdefault(key, row)
+    ordered = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [{**rows[key], "_rrf_score": scores[key]} for key in ordered]
+
+
+def _vector_search(
+    table,
+    embedding: List[float],
+    doc_ids: Optional[List[str]],
+    limit: int,
+    nprobes: int | None = None,
+    refine_factor: int | None = None,
+) -> List[Dict[str, Any]]:
+    query = table.search(embedding).limit(limit)
+    if nprobes:
+        query = query.nprobes(nprobes)
+    if refine_factor:
+        query = query.refine_factor(refine_factor)
+    if doc_ids:
+        # 预过滤：借助 doc_id 标量索引先缩小候选集，再做向量检索
+        query = query.where(in_filter("doc_id", doc_ids), prefilter=True)
+    with observe(SEARCH_LATENCY, table.name, "vector"):
+        return query.to_list()
+
+
+def _fts_columns(table) -> frozenset:
+    version = table.version
+    with _FTS_COLUMNS_LOCK:
+        cached = _FTS_COLUMNS.get(table.name)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    columns = frozenset(
+        idx.columns[0] for idx in table.list_indices() if len(idx.columns) == 1
+    )
+    with _FTS_COLUMNS_LOCK:
+        _FTS_COLUMNS[table.name] = (version, columns)
+    return columns
+
+
+def _fts_search(table, query_text: str, column: str, doc_ids: Optional[List[str]], limit: int) -> List[Dict[str, Any]]:
+    if column not in _fts_columns(table):
+        # 尚未建立全文索引的旧表，退化为仅向量检索
+        return []
+    query = table.search(query_text, query_type="fts", fts_columns=column).limit(limit)
+    if doc_ids:
+        query = query.where(in_filter("doc_id", doc_ids), prefilter=True)
+    try:
+        with observe(SEARCH_LATENCY, table.name, "fts"):
+            return query.to_list()
+    except Exception:
+        logger.exception("full-text search failed on %s.%s", table.name, column)
+        return []
+
+
+def _merge_by_distance(result_lists: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+    merged = [row for results in result_lists for row in results]
+    merged.sort(key=lambda row: row.get("_distance", float("inf")))
+    # 各表使用同一嵌入模型与度量，距离可直接比较；额外给出 (0, 1] 区间的相似度
+    return [{**row, "_score": 1.0 / (1.0 + float(row.get("_distance", 0.0)))} for row in merged[:top_k]]
+
+
+def search_lancedb(
+    client,
+    embedding: List[float],
+    doc_ids: Optional[List[str]],
+    top_k: int,
+    mode: str = "vector",
+    query_text: str | None = None,
+    rrf_k: int = 60,
+    nprobes: int | None = None,
+    refine_factor: int | None = None,
+) -> List[Dict[str, Any]]:
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"unsupported search mode: {mode}")
+
+    table_names = client.table_names()
+    fetch_k = top_k if mode == "vector" else top_k * 2
+    jobs: List[Tuple[str, Future]] = []
+    for name, fts_columns in SEARCH_TABLES.items():
+        if name not in table_names:
+            continue
+        table = client.open_table(name)
+        if mode in ("vector", "hybrid") and embedding:
+            jobs.append((name, _SEARCH_POOL.submit(
+                _vector_search, table, embedding, doc_ids, fetch_k, nprobes, refine_factor
+            )))
+        if mode in ("fts", "hybrid") and query_text:
+            for column in fts_columns:
+                jobs.append((name, _SEARCH_POOL.submit(_fts_search, table, query_text, column, doc_ids, fetch_k)))
+
+    ranked_lists = [(name, future.result()) for name, future in jobs]
+    if mode == "vector":
+        return _merge_by_distance([results for _, results in ranked_lists], top_k)
+    return _rrf_fuse(ranked_lists, rrf_k, top_k)
+
+
+def index_status(client, rebuild_ratio: float) -> Dict[str, Any]:
+    report: Dict[str, Any] = {}
+    table_names = client.table_names()
+    for name in SEARCH_TABLES:
+        if name not in table_names:
+            continue
+        table = client.open_table(name)
+        rows = table.count_rows()
+        indices = []
+        for idx in table.list_indices():
+            stats = table.index_stats(idx.name)
+            unindexed = int(index_stat(stats, "num_unindexed_rows") or 0)
+            indices.append(
+                {
+                    "name": idx.name,
+                    "index_type": str(idx.index_type),
+                    "columns": list(idx.columns),
+                    "num_indexed_rows": index_stat(stats, "num_indexed_rows"),
+                    "num_unindexed_rows": unindexed,
+                    "stale": bool(rows) and unindexed / rows >= rebuild_ratio,
+                }
+            )
+        report[name] = {"rows": rows, "version": table.version, "indices": indices}
+    return report
+
+
+def _build_messages(query: str, contexts: List[Dict[str, Any]], config: Dict[str, Any]) -> List[Dict[str, Any]]:
     prompt_path = config.get("prompts", {}).get("rag_answer")
     system_prompt = (
         Path(prompt_path).read_text(encoding="utf-8")
@@ -41,12 +172,34 @@ def generate_answer(query: str, contexts: List[Dict[str, Any]], config: Dict[str
     context_text = "\n".join(
         [f"[{c.get('doc_id')}#{c.get('node_id')}] {c.get('text') or c.get('summary')}" for c in contexts]
     )
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": f"问题：{query}\n检索片段：\n{context_text[:12000]}"},
     ]
-    content = chat_complete(llm_cfg["base_url"], llm_cfg["api_key"], llm_cfg["model_name"], messages)
+
+
+def _parse_answer(content: str) -> Dict[str, Any]:
     payload = safe_json(content)
     if payload:
         return payload
     return {"answer": content, "sources": []}
+
+
+def generate_answer(query: str, contexts: List[Dict[str, Any]], config: Dict[str, Any]) -> Dict[str, Any]:
+    llm_cfg = config["models"]["llm"]
+    messages = _build_messages(query, contexts, config)
+    with observe(LLM_LATENCY, "rag_answer"):
+        content = chat_complete(llm_cfg["base_url"], llm_cfg["api_key"], llm_cfg["model_name"], messages)
+    return _parse_answer(content)
+
+
+def stream_answer(query: str, contexts: List[Dict[str, Any]], config: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    llm_cfg = config["models"]["llm"]
+    messages = _build_messages(query, contexts, config)
+    parts: List[str] = []
+    # 客户端中途断开时生成器被关闭，with 仍会记录已耗时
+    with observe(LLM_LATENCY, "rag_answer_stream"):
+        for delta in chat_complete_stream(llm_cfg["base_url"], llm_cfg["api_key"], llm_cfg["model_name"], messages):
+            parts.append(delta)
+            yield "token", delta
+    yield "done", _parse_answer("".join(parts))
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except Exception:  # pragma: no cover
+    brotli = None
+
+
+def _accepted_encodings(accept_encoding: str) -> set[str]:
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        accepted.add(token)
+    return accepted
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # 弱比较：忽略 W/ 前缀
+    target = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == target for tag in if_none_match.split(","))
+
+
+class TreeEntry:
+    def __init__(self, signature: Tuple[int, int], body: bytes) -> None:
+        self.signature = signature
+        self.body = body
+        self.etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _encode(self, encoding: str) -> bytes:
+        with self._lock:
+            if encoding not in self._encoded:
+                if encoding == "br":
+                    self._encoded[encoding] = brotli.compress(self.body, quality=5)
+                else:
+                    self._encoded[encoding] = gzip.compress(self.body, compresslevel=6)
+            return self._encoded[encoding]
+
+    def select(self, accept_encoding: str, min_size: int = 1024) -> Tuple[Optional[str], bytes]:
+        if len(self.body) < min_size:
+            return None, self.body
+        accepted = _accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            return "br", self._encode("br")
+        if "gzip" in accepted:
+            return "gzip", self._encode("gzip")
+        return None, self.body
+
+
+class TreeResponseCache:
+    def __init__(self, max_entries: int = 32) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, TreeEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, doc_id: str, tree_path: Path) -> Optional[TreeEntry]:
+        try:
+            stat = tree_path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(doc_id, None)
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(doc_id)
+                return entry
+
+        tree = json.loads(tree_path.read_text(encoding="utf-8"))
+        body = json.dumps({"doc_id": doc_id, "tree": tree}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        entry = TreeEntry(signature, body)
+        with self._lock:
+            self._entries[doc_id] = entry
+            self._entries.move_to_end(doc_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, doc_id: str) -> None:
+        with self._lock:
+            self._entries.pop(doc_id, None)
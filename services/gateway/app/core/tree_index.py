@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+INDEX_FIELDS = {"node_id", "title", "level", "parent_id"}
+
+
+class StaleTreeIndexError(RuntimeError):
+    pass
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _nodes_name(tree_path: Path, signature: Tuple[int, int]) -> str:
+    # 节点文件名带上源文件签名，每代独立成文件，重建不会原地覆盖正在读取的旧文件
+    return f"{tree_path.stem}.nodes.{signature[0]}-{signature[1]}.jsonl"
+
+
+def _gc_generations(tree_path: Path, signature: Tuple[int, int]) -> None:
+    tree_path.with_suffix(".nodes.jsonl").unlink(missing_ok=True)
+    for path in tree_path.parent.glob(f"{tree_path.stem}.nodes.*-*.jsonl"):
+        generation = path.name[len(tree_path.stem) + len(".nodes.") : -len(".jsonl")]
+        try:
+            mtime_ns = int(generation.split("-", 1)[0])
+        except ValueError:
+            continue
+        # 只清理更旧的代，并发构建出的新代留给其对应的索引使用
+        if mtime_ns < signature[0]:
+            path.unlink(missing_ok=True)
+
+
+class TreeIndex:
+    def __init__(self, nodes_path: Path, data: Dict[str, Any]) -> None:
+        self.nodes_path = nodes_path
+        self.signature: Tuple[int, int] = tuple(data["source"])
+        self.meta: Dict[str, Any] = data.get("meta", {})
+        self.roots: List[str] = data["roots"]
+        self.nodes: Dict[str, Dict[str, Any]] = data["nodes"]
+
+    @classmethod
+    def build(cls, tree_path: Path, signature: Tuple[int, int]) -> "TreeIndex":
+        tree = json.loads(tree_path.read_text(encoding="utf-8"))
+        nodes_path = tree_path.with_name(_nodes_name(tree_path, signature))
+        index_path = tree_path.with_suffix(".index.json")
+        entries: Dict[str, Dict[str, Any]] = {}
+        lines: List[bytes] = []
+        offset = 0
+
+        def walk(nodes: List[Dict[str, Any]], parent_id: Optional[str]) -> List[str]:
+            nonlocal offset
+            ids: List[str] = []
+            for node in nodes:
+                node_id = str(node.get("node_id"))
+                if node_id in entries:
+                    # 旧版解析可能产生重复 node_id，追加序号保证可寻址
+                    node_id = f"{node_id}~{len(entries)}"
+                ids.append(node_id)
+                body = {k: v for k, v in node.items() if k != "children"}
+                body["node_id"] = node_id
+                line = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                entry = {
+                    "offset": offset,
+                    "length": len(line),
+                    "parent_id": parent_id,
+                    "title": node.get("title"),
+                    "level": node.get("level"),
+                }
+                entries[node_id] = entry
+                lines.append(line)
+                offset += len(line)
+                entry["children"] = walk(node.get("children") or [], node_id)
+            return ids
+
+        roots = walk(tree.get("nodes", []), None)
+        data = {
+            "source": list(signature),
+            "nodes_file": nodes_path.name,
+            "meta": {k: v for k, v in tree.items() if k != "nodes"},
+            "roots": roots,
+            "nodes": entries,
+        }
+        _write_atomic(nodes_path, b"".join(lines))
+        _write_atomic(index_path, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        _gc_generations(tree_path, signature)
+        return cls(nodes_path, data)
+
+    @classmethod
+    def load(cls, tree_path: Path, signature: Tuple[int, int]) -> "TreeIndex":
+        index_path = tree_path.with_suffix(".index.json")
+        if index_path.exists():
+            try:
+                data = json.loads(index_path.read_text(encoding="utf-8"))
+                nodes_path = tree_path.with_name(data["nodes_file"])
+                if tuple(data.get("source", [])) == signature and nodes_path.exists():
+                    return cls(nodes_path, data)
+            except (ValueError, KeyError, TypeError):
+                pass
+        # 索引缺失或落后于树文件时，整树解析一次并重建
+        return cls.build(tree_path, signature)
+
+    def _read_nodes(self, node_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        found: Dict[str, Dict[str, Any]] = {}
+        ordered = sorted(node_ids, key=lambda nid: self.nodes[nid]["offset"])
+        if not ordered:
+            return found
+        try:
+            with self.nodes_path.open("rb") as f:
+                for node_id in ordered:
+                    entry = self.nodes[node_id]
+                    f.seek(entry["offset"])
+                    node = json.loads(f.read(entry["length"]))
+                    if not isinstance(node, dict) or node.get("node_id") != node_id:
+                        raise StaleTreeIndexError(node_id)
+                    found[node_id] = node
+        except (OSError, ValueError) as exc:
+            # 节点文件被清理或内容与偏移不符，交由调用方重建索引
+            raise StaleTreeIndexError(str(self.nodes_path)) from exc
+        return found
+
+    def subtree(self, node_id: Optional[str], depth: Optional[int], fields: Optional[set[str]]) -> List[Dict[str, Any]]:
+        start = self.roots if node_id is None else [node_id]
+        selected: List[Tuple[str, int]] = []
+
+        def collect(ids: List[str], level: int) -> None:
+            for nid in ids:
+                selected.append((nid, level))
+                if depth is None or level < depth:
+                    collect(self.nodes[nid]["children"], level + 1)
+
+        collect(start, 0)
+        need_body = fields is None or not fields <= INDEX_FIELDS
+        bodies = self._read_nodes(nid for nid, _ in selected) if need_body else {}
+
+        def render(nid: str, level: int) -> Dict[str, Any]:
+            entry = self.nodes[nid]
+            if need_body:
+                node = bodies[nid]
+                node["parent_id"] = entry["parent_id"]
+            else:
+                node = {"node_id": nid, "title": entry["title"], "level": entry["level"], "parent_id": entry["parent_id"]}
+            if fields is not None:
+                node = {k: v for k, v in node.items() if k in fields or k == "node_id"}
+            node["child_count"] = len(entry["children"])
+            if depth is None or level < depth:
+                node["children"] = [render(child, level + 1) for child in entry["children"]]
+            return node
+
+        return [render(nid, 0) for nid in start]
+
+
+class TreeIndexCache:
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, TreeIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, doc_id: str, tree_path: Path, rebuild: bool = False) -> Optional[TreeIndex]:
+        try:
+            stat = tree_path.stat()
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            index = self._entries.get(doc_id)
+            if not rebuild and index is not None and index.signature == signature:
+                self._entries.move_to_end(doc_id)
+                return index
+        index = TreeIndex.build(tree_path, signature) if rebuild else TreeIndex.load(tree_path, signature)
+        with self._lock:
+            self._entries[doc_id] = index
+            self._entries.move_to_end(doc_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
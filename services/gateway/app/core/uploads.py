@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+
+class UploadNotFound(Exception):
+    pass
+
+
+class UploadOffsetMismatch(Exception):
+    def __init__(self, offset: int) -> None:
+        super().__init__(f"offset mismatch, server offset is {offset}")
+        self.offset = offset
+
+
+class UploadSizeExceeded(Exception):
+    pass
+
+
+class ChunkedUploadStore:
+    def __init__(self, root: Path, max_age_s: int = 86400) -> None:
+        self.root = root
+        self.max_age_s = max_age_s
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, upload_id: str) -> Path:
+        # upload_id 由服务端生成，拒绝任何带路径分隔的输入
+        if not upload_id or Path(upload_id).name != upload_id:
+            raise UploadNotFound(upload_id)
+        return self.root / upload_id
+
+    def _lock(self, upload_id: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(upload_id, threading.Lock())
+
+    def _read_meta(self, upload_id: str) -> Dict[str, Any]:
+        meta_path = self._dir(upload_id) / "meta.json"
+        if not meta_path.exists():
+            raise UploadNotFound(upload_id)
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+
+    def cleanup(self) -> None:
+        deadline = time.time() - self.max_age_s
+        for path in self.root.iterdir():
+            if not path.is_dir():
+                continue
+            # 追加分片不会更新目录 mtime，以 data.part 的最后写入时间判断会话是否仍活跃
+            last_active = 0.0
+            for candidate in (path, path / "meta.json", path / "data.part"):
+                try:
+                    last_active = max(last_active, candidate.stat().st_mtime)
+                except FileNotFoundError:
+                    continue
+            if last_active < deadline:
+                shutil.rmtree(path, ignore_errors=True)
+                with self._locks_guard:
+                    self._locks.pop(path.name, None)
+
+    def init(self, filename: str, size: int, **extra: Any) -> Dict[str, Any]:
+        self.cleanup()
+        upload_id = uuid.uuid4().hex
+        upload_dir = self.root / upload_id
+        upload_dir.mkdir(parents=True)
+        meta = {"upload_id": upload_id, "filename": Path(filename).name, "size": size, **extra}
+        (upload_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        (upload_dir / "data.part").touch()
+        return {**meta, "offset": 0}
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        meta = self._read_meta(upload_id)
+        return {**meta, "offset": (self._dir(upload_id) / "data.part").stat().st_size}
+
+    def append(self, upload_id: str, offset: int, data: bytes) -> int:
+        meta = self._read_meta(upload_id)
+        part_path = self._dir(upload_id) / "data.part"
+        with self._lock(upload_id):
+            current = part_path.stat().st_size
+            if offset != current:
+                raise UploadOffsetMismatch(current)
+            if current + len(data) > int(meta["size"]):
+                raise UploadSizeExceeded(upload_id)
+            with part_path.open("ab") as f:
+                f.write(data)
+            return current + len(data)
+
+    def complete(self, upload_id: str) -> Tuple[Dict[str, Any], Path, str]:
+        meta = self._read_meta(upload_id)
+        part_path = self._dir(upload_id) / "data.part"
+        with self._lock(upload_id):
+            current = part_path.stat().st_size
+            if current != int(meta["size"]):
+                raise UploadOffsetMismatch(current)
+            hasher = hashlib.sha256()
+            with part_path.open("rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+        return meta, part_path, hasher.hexdigest()
+
+    def discard(self, upload_id: str) -> None:
+        shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+        with self._locks_guard:
+            self._locks.pop(upload_id, None)
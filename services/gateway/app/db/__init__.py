@@ -1,3 +1,3 @@
 from .lancedb_client import LanceDBClient
 from .sqlite import create_sqlite_engine, create_session_factory, init_db, session_scope
-from .models import Base, Document, ProjectConfig, QuestionBinding, DocumentTree
+from .models import Base, Document, ProjectConfig, QuestionBinding, UploadBatch
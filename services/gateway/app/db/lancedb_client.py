@@ -1,10 +1,20 @@
 from __future__ import annotations
 
+import threading
+import time
+from typing import Any, Dict, Set, Tuple
+
 
 class LanceDBClient:
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, refresh_interval_s: float = 5.0) -> None:
         self.path = path
+        self.refresh_interval_s = refresh_interval_s
         self._db = None
+        self._lock = threading.Lock()
+        self._names: Tuple[Set[str], float] = (set(), 0.0)
+        # 表句柄缓存：name -> (handle, 上次检查版本的时间)
+        self._tables: Dict[str, Tuple[Any, float]] = {}
+        self.refreshes = 0
 
     def connect(self):
         import lancedb
@@ -12,3 +22,41 @@ class LanceDBClient:
         if self._db is None:
             self._db = lancedb.connect(self.path)
         return self._db
+
+    def table_names(self) -> Set[str]:
+        names, checked_at = self._names
+        now = time.monotonic()
+        if now - checked_at < self.refresh_interval_s:
+            return names
+        names = set(self.connect().table_names())
+        self._names = (names, now)
+        return names
+
+    def open_table(self, name: str):
+        now = time.monotonic()
+        cached = self._tables.get(name)
+        if cached and now - cached[1] < self.refresh_interval_s:
+            return cached[0]
+
+        with self._lock:
+            cached = self._tables.get(name)
+            if cached and now - cached[1] < self.refresh_interval_s:
+                return cached[0]
+            latest = self.connect().open_table(name)
+            # 版本未变化时沿用旧句柄，保留其已加载的索引缓存
+            if cached and cached[0].version == latest.version:
+                handle = cached[0]
+            else:
+                handle = latest
+                if cached:
+                    self.refreshes += 1
+            self._tables[name] = (handle, now)
+            return handle
+
+    def invalidate(self, name: str | None = None) -> None:
+        with self._lock:
+            if name is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(name, None)
+            self._names = (set(), 0.0)
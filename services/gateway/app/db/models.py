@@ -3,7 +3,7 @@ from __future__ import annotations
 import datetime as dt
 import uuid
 
-from sqlalchemy import String, DateTime, Text
+from sqlalchemy import Boolean, Integer, String, DateTime, Text, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -22,6 +22,11 @@ class ProjectConfig(Base):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (
+        Index("ix_documents_created_at_id", "created_at", "id"),
+        Index("ix_documents_status", "status"),
+        Index("ix_documents_doc_type", "doc_type"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     filename: Mapped[str] = mapped_column(String(255))
@@ -33,6 +38,9 @@ class Document(Base):
     result_path: Mapped[str] = mapped_column(String(512), default="")
     last_step: Mapped[str] = mapped_column(String(32), default="")
     error_message: Mapped[str] = mapped_column(Text, default="")
+    has_tree: Mapped[bool] = mapped_column(Boolean, default=False)
+    project_id: Mapped[str] = mapped_column(String(64), default="")
+    progress_json: Mapped[str] = mapped_column(Text, default="")
     created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
     updated_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
 
@@ -50,9 +58,10 @@ class QuestionBinding(Base):
     created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
 
 
-class DocumentTree(Base):
-    __tablename__ = "document_trees"
+class UploadBatch(Base):
+    __tablename__ = "upload_batches"
 
-    doc_id: Mapped[str] = mapped_column(String(36), primary_key=True)
-    tree_json: Mapped[str] = mapped_column(Text)
-    updated_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    doc_ids_json: Mapped[str] = mapped_column(Text, default="[]")
+    created_at: Mapped[dt.datetime] = mapped_column(DateTime, default=dt.datetime.utcnow)
@@ -1,26 +1,38 @@
 from __future__ import annotations
 
 from contextlib import contextmanager
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 import sqlite3
+from pathlib import Path
+
+from services.common.status_store import configure_connection
 
 from .models import Base
 
 
 def create_sqlite_engine(db_path: str):
-    return create_engine(f"sqlite:///{db_path}", echo=False, future=True)
+    engine = create_engine(f"sqlite:///{db_path}", echo=False, future=True, connect_args={"timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        # 与 Worker 状态写入共用 WAL，读请求不再被写锁阻塞
+        configure_connection(dbapi_conn)
+
+    return engine
 
 
 def create_session_factory(engine):
     return sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 
-def init_db(engine):
+def init_db(engine, base_path: str | None = None):
     Base.metadata.create_all(engine)
     _ensure_document_columns(engine)
-    _ensure_document_trees_table(engine)
+    if base_path:
+        _backfill_has_tree_from_files(engine, Path(base_path))
+    _ensure_document_indexes(engine)
 
 
 def _ensure_document_columns(engine):
@@ -35,17 +47,42 @@ def _ensure_document_columns(engine):
             "last_step": "TEXT",
             "error_message": "TEXT",
             "updated_at": "TEXT",
+            "has_tree": "INTEGER DEFAULT 0",
+            "project_id": "TEXT DEFAULT ''",
+            "progress_json": "TEXT",
         }
         for name, col_type in columns.items():
             if name not in existing:
                 conn.exec_driver_sql(f"ALTER TABLE documents ADD COLUMN {name} {col_type}")
+        if "has_tree" not in existing:
+            # 按节点表 tree_meta 回填；旧库遗留的 document_trees 若存在也一并计入
+            tables = {
+                row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+            }
+            for table in ("tree_meta", "document_trees"):
+                if table in tables:
+                    conn.exec_driver_sql(f"UPDATE documents SET has_tree = 1 WHERE id IN (SELECT doc_id FROM {table})")
+
+
+def _backfill_has_tree_from_files(engine, base_path: Path):
+    # 早期文档只有 knowledge_tree.json 快照、没有节点表记录，按磁盘文件一次性补齐
+    with engine.begin() as conn:
+        if conn.exec_driver_sql("PRAGMA user_version").scalar() >= 1:
+            return
+        doc_ids = [row[0] for row in conn.exec_driver_sql("SELECT id FROM documents WHERE COALESCE(has_tree, 0) = 0")]
+        found = [(doc_id,) for doc_id in doc_ids if (base_path / doc_id / "knowledge_tree.json").exists()]
+        if found:
+            conn.exec_driver_sql("UPDATE documents SET has_tree = 1 WHERE id = ?", found)
+        conn.exec_driver_sql("PRAGMA user_version = 1")
 
 
-def _ensure_document_trees_table(engine):
+def _ensure_document_indexes(engine):
     with engine.begin() as conn:
         conn.exec_driver_sql(
-            "CREATE TABLE IF NOT EXISTS document_trees (doc_id TEXT PRIMARY KEY, tree_json TEXT, updated_at TEXT)"
+            "CREATE INDEX IF NOT EXISTS ix_documents_created_at_id ON documents (created_at, id)"
         )
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_documents_status ON documents (status)")
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_documents_doc_type ON documents (doc_type)")
 
 
 @contextmanager
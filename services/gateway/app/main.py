@@ -1,22 +1,50 @@
 from __future__ import annotations
 
 import os
+import asyncio
+import base64
+import datetime as dt
+import json
 import hashlib
 import shutil
 import uuid
+import zipfile
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Literal
 
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from celery import group
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from dotenv import load_dotenv
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from sqlalchemy import and_, func, or_
+
+from services.common.config import invalidate_config, publish_config_reload
+from services.common.metrics import EMBEDDING_LATENCY, observe, render_latest
+from services.common.tree_store import NodeNotFound, TreeVersionConflict, get_tree_store
 
 from .core.config_manager import load_config
+from .core.project_config import ProjectConfigCache
+from .core.progress_hub import ProgressHub, is_terminal
 from .core.celery_app import create_celery
 from .core.llm_client import embed_texts
-from .core.rag import search_lancedb, generate_answer
-from .db import LanceDBClient, create_sqlite_engine, create_session_factory, init_db, session_scope, Document
+from .core.embedding_cache import EmbeddingCache
+from .core.answer_cache import SemanticAnswerCache, start_invalidation_listener
+from .core.tree_cache import TreeResponseCache, etag_matches
+from .core.tree_index import StaleTreeIndexError, TreeIndexCache
+from .core.uploads import ChunkedUploadStore, UploadNotFound, UploadOffsetMismatch, UploadSizeExceeded
+from .core.rag import search_lancedb, generate_answer, stream_answer, index_status
+from .db import (
+    LanceDBClient,
+    create_sqlite_engine,
+    create_session_factory,
+    init_db,
+    session_scope,
+    Document,
+    UploadBatch,
+)
 
 
 load_dotenv()
@@ -31,6 +59,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 
@@ -40,12 +69,31 @@ class ConfigOverride(BaseModel):
 
 class TreePayload(BaseModel):
     data: Dict[str, Any]
+    version: int | None = None
+
+
+class NodePatch(BaseModel):
+    fields: Dict[str, Any]
+    version: int | None = None
+
+
+class UploadPrecheck(BaseModel):
+    file_hash: str
+
+
+class UploadInit(BaseModel):
+    filename: str
+    size: int = Field(ge=0)
+    file_hash: str | None = None
+    doc_type: str = "textbook"
+    target_doc_id: str | None = None
+    project_id: str | None = None
 
 
 class ChatQuery(BaseModel):
     query: str
     doc_ids: list[str] | None = None
-    mode: str = "hybrid"
+    mode: Literal["vector", "fts", "hybrid"] = "hybrid"
     top_k: int | None = None
 
 @app.on_event("startup")
@@ -55,12 +103,42 @@ def startup():
     sqlite_path.parent.mkdir(parents=True, exist_ok=True)
 
     engine = create_sqlite_engine(str(sqlite_path))
-    init_db(engine)
+    init_db(engine, config.storage.base_path)
     session_factory = create_session_factory(engine)
 
-    app.state.config = config
     app.state.session_factory = session_factory
-    app.state.lancedb = LanceDBClient(config.storage.lancedb_path).connect()
+    app.state.project_configs = ProjectConfigCache(session_factory)
+    app.state.tree_store = get_tree_store(config.model_dump())
+    app.state.tree_cache = TreeResponseCache(config.gateway.tree_cache_entries)
+    app.state.tree_index = TreeIndexCache()
+    app.state.uploads = ChunkedUploadStore(Path(config.storage.base_path) / "_uploads")
+    app.state.progress_hub = ProgressHub(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    app.state.lancedb = LanceDBClient(config.storage.lancedb_path, config.rag.table_refresh_interval_s)
+
+    emb_cache_cfg = config.cache.embedding
+    app.state.embedding_cache = (
+        EmbeddingCache(
+            max_entries=emb_cache_cfg.max_entries,
+            ttl_s=emb_cache_cfg.ttl_s,
+            redis_url=emb_cache_cfg.redis_url,
+        )
+        if emb_cache_cfg.enable
+        else None
+    )
+
+    answer_cache_cfg = config.cache.answer
+    app.state.answer_cache = None
+    if answer_cache_cfg.enable:
+        app.state.answer_cache = SemanticAnswerCache(
+            max_entries=answer_cache_cfg.max_entries,
+            threshold=answer_cache_cfg.threshold,
+            ttl_s=answer_cache_cfg.ttl_s,
+        )
+        start_invalidation_listener(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+            answer_cache_cfg.invalidation_channel,
+            app.state.answer_cache,
+        )
 
 
 
@@ -69,87 +147,146 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
 @app.get("/api/config/global")
 def get_global_config():
     config = load_config()
     return config.model_dump()
 
 
+@app.post("/api/config/reload")
+def reload_config():
+    # 通知所有网关副本与 Worker 丢弃缓存配置
+    invalidate_config()
+    publish_config_reload(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    return {"status": "reloaded"}
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    cache = app.state.embedding_cache
+    answer_cache = app.state.answer_cache
+    return {
+        "embedding": cache.stats() if cache else None,
+        "answer": answer_cache.stats() if answer_cache else None,
+        "progress": app.state.progress_hub.stats(),
+    }
+
+
+@app.get("/api/admin/index/status")
+def admin_index_status():
+    return index_status(app.state.lancedb, load_config().rag.index_rebuild_ratio)
+
+
+@app.post("/api/admin/index/maintain")
+def admin_index_maintain():
+    task = celery_app.send_task("maintain_indexes", queue="analyze_task")
+    return {"task_id": task.id, "status": "queued"}
+
+
+@app.get("/api/config/project/{project_id}")
+def get_project_config(project_id: str):
+    project_configs = app.state.project_configs
+    return {
+        "project_id": project_id,
+        "overrides": project_configs.overrides(project_id),
+        "effective_config": project_configs.effective(project_id).model_dump(),
+    }
+
+
 @app.post("/api/config/project/{project_id}")
 def set_project_config(project_id: str, override: ConfigOverride):
-    config = load_config(overrides=override.data)
+    try:
+        config = app.state.project_configs.set(project_id, override.data)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"配置校验失败: {exc}")
     return {"project_id": project_id, "effective_config": config.model_dump()}
 
 
-@app.post("/api/upload")
-def upload_pdf(
-    file: UploadFile = File(...),
-    doc_type: str = Form("textbook"),
-    target_doc_id: str | None = Form(None),
-):
-    config = app.state.config
-    base_path = Path(config.storage.base_path)
-    doc_id = str(uuid.uuid4())
-    doc_dir = base_path / doc_id
-    doc_dir.mkdir(parents=True, exist_ok=True)
+def _task_kwargs(project_id: str | None) -> Dict[str, Any]:
+    # 项目级覆盖项随任务下发，Worker 据此合并出与网关一致的配置
+    overrides = app.state.project_configs.overrides(project_id)
+    return {"config_overrides": overrides} if overrides else {}
 
-    input_path = doc_dir / file.filename
+
+def _save_stream(stream, input_path: Path) -> str:
     hasher = hashlib.sha256()
     with input_path.open("wb") as f:
         while True:
-            chunk = file.file.read(1024 * 1024)
+            chunk = stream.read(1024 * 1024)
             if not chunk:
                 break
             hasher.update(chunk)
             f.write(chunk)
-    file_hash = hasher.hexdigest()
+    return hasher.hexdigest()
+
+
+def _find_by_hash(session, file_hash: str) -> Document | None:
+    return (
+        session.query(Document)
+        .filter(Document.file_hash == file_hash)
+        .order_by(Document.created_at.desc())
+        .first()
+    )
 
-    with session_scope(app.state.session_factory) as session:
-        existing = (
-            session.query(Document)
-            .filter(Document.file_hash == file_hash)
-            .order_by(Document.created_at.desc())
-            .first()
-        )
-        if existing:
-            shutil.rmtree(doc_dir, ignore_errors=True)
-            if existing.status != "completed":
-                task = celery_app.send_task(
-                    "parse_task",
-                    args=[existing.source_path or str(input_path), existing.id, existing.doc_type, existing.target_doc_id],
-                    queue="parse_task",
-                )
-                return {
-                    "doc_id": existing.id,
-                    "status": existing.status,
-                    "dedup": True,
-                    "message": "已存在相同文档，未完成流程，已自动续跑",
-                    "task_id": task.id,
-                }
-            return {
-                "doc_id": existing.id,
-                "status": existing.status,
-                "dedup": True,
-                "message": "已存在相同文档，跳过重复处理",
-            }
 
+def _dedup_response(existing: Document) -> Dict[str, Any]:
+    if existing.status != "completed" and existing.source_path:
+        task = celery_app.send_task(
+            "parse_task",
+            args=[existing.source_path, existing.id, existing.doc_type, existing.target_doc_id],
+            kwargs=_task_kwargs(existing.project_id),
+            queue="parse_task",
+        )
+        return {
+            "doc_id": existing.id,
+            "status": existing.status,
+            "dedup": True,
+            "message": "已存在相同文档，未完成流程，已自动续跑",
+            "task_id": task.id,
+        }
+    return {
+        "doc_id": existing.id,
+        "status": existing.status,
+        "dedup": True,
+        "message": "已存在相同文档，跳过重复处理",
+    }
+
+
+def _register_document(
+    doc_id: str,
+    filename: str,
+    file_hash: str,
+    input_path: Path,
+    doc_type: str,
+    target_doc_id: str | None,
+    project_id: str | None = None,
+) -> Dict[str, Any]:
     with session_scope(app.state.session_factory) as session:
         session.add(
             Document(
                 id=doc_id,
-                filename=file.filename,
+                filename=filename,
                 file_hash=file_hash,
                 status="uploaded",
                 doc_type=doc_type,
                 target_doc_id=target_doc_id or "",
                 source_path=str(input_path),
                 result_path="",
+                project_id=project_id or "",
             )
         )
 
+    task_kwargs = _task_kwargs(project_id)
     task = celery_app.send_task(
         "parse_task",
         args=[str(input_path), doc_id, doc_type, target_doc_id],
+        kwargs=task_kwargs,
         queue="parse_task",
     )
     # 目录预检：并行调用 VLM 目录抽取
@@ -157,11 +294,284 @@ def upload_pdf(
         celery_app.send_task(
             "toc_precheck",
             args=[doc_id, str(input_path)],
+            kwargs=task_kwargs,
             queue="analyze_task",
         )
     return {"doc_id": doc_id, "task_id": task.id, "status": "queued"}
 
 
+@app.post("/api/upload")
+def upload_pdf(
+    file: UploadFile = File(...),
+    doc_type: str = Form("textbook"),
+    target_doc_id: str | None = Form(None),
+    project_id: str | None = Form(None),
+):
+    config = load_config()
+    base_path = Path(config.storage.base_path)
+    doc_id = str(uuid.uuid4())
+    doc_dir = base_path / doc_id
+    doc_dir.mkdir(parents=True, exist_ok=True)
+
+    input_path = doc_dir / file.filename
+    file_hash = _save_stream(file.file, input_path)
+
+    with session_scope(app.state.session_factory) as session:
+        existing = _find_by_hash(session, file_hash)
+        if existing:
+            shutil.rmtree(doc_dir, ignore_errors=True)
+            return _dedup_response(existing)
+
+    return _register_document(doc_id, file.filename, file_hash, input_path, doc_type, target_doc_id, project_id)
+
+
+def _zip_member_name(info: zipfile.ZipInfo) -> str:
+    # Windows 压缩工具常以 GBK 写入文件名且不设置 UTF-8 标志位
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("gbk")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def _stage_batch_files(files: list[UploadFile], base_path: Path) -> list[Dict[str, Any]]:
+    staged: list[Dict[str, Any]] = []
+
+    def stage(stream, filename: str) -> None:
+        doc_id = str(uuid.uuid4())
+        doc_dir = base_path / doc_id
+        doc_dir.mkdir(parents=True, exist_ok=True)
+        input_path = doc_dir / Path(filename).name
+        file_hash = _save_stream(stream, input_path)
+        staged.append({"doc_id": doc_id, "filename": input_path.name, "file_hash": file_hash, "input_path": input_path})
+
+    for upload in files:
+        name = upload.filename or ""
+        if name.lower().endswith(".zip"):
+            with zipfile.ZipFile(upload.file) as zf:
+                for info in zf.infolist():
+                    member = _zip_member_name(info)
+                    if info.is_dir() or not member.lower().endswith(".pdf") or "__MACOSX" in member:
+                        continue
+                    with zf.open(info) as stream:
+                        stage(stream, member)
+        else:
+            stage(upload.file, name)
+    return staged
+
+
+@app.post("/api/upload/batch")
+def upload_batch(
+    files: list[UploadFile] = File(...),
+    doc_type: str = Form("textbook"),
+    target_doc_id: str | None = Form(None),
+    project_id: str | None = Form(None),
+):
+    base_path = Path(load_config().storage.base_path)
+    staged = _stage_batch_files(files, base_path)
+    if not staged:
+        raise HTTPException(status_code=400, detail="未找到可处理的 PDF 文件")
+
+    existing_by_hash: Dict[str, Document] = {}
+    hashes = sorted({item["file_hash"] for item in staged})
+    signatures = []
+    items: list[Dict[str, Any]] = []
+    batch_id = str(uuid.uuid4())
+    task_kwargs = _task_kwargs(project_id)
+    with session_scope(app.state.session_factory) as session:
+        # SQLite 单条语句参数个数有限，超大批次分段查询
+        for i in range(0, len(hashes), 500):
+            for doc in session.query(Document).filter(Document.file_hash.in_(hashes[i : i + 500])):
+                existing_by_hash.setdefault(doc.file_hash, doc)
+
+        seen: Dict[str, str] = {}
+        new_docs: list[Document] = []
+        for item in staged:
+            file_hash = item["file_hash"]
+            existing = existing_by_hash.get(file_hash)
+            duplicate_of = existing.id if existing else seen.get(file_hash)
+            if duplicate_of:
+                shutil.rmtree(item["input_path"].parent, ignore_errors=True)
+                entry = {"filename": item["filename"], "doc_id": duplicate_of, "dedup": True}
+                if existing and existing.status != "completed" and existing.source_path and existing.id not in seen.values():
+                    signatures.append(
+                        celery_app.signature(
+                            "parse_task",
+                            args=[existing.source_path, existing.id, existing.doc_type, existing.target_doc_id],
+                            kwargs=_task_kwargs(existing.project_id),
+                            queue="parse_task",
+                        )
+                    )
+                    entry["resumed"] = True
+                seen.setdefault(file_hash, duplicate_of)
+                items.append(entry)
+                continue
+
+            seen[file_hash] = item["doc_id"]
+            input_path = str(item["input_path"])
+            new_docs.append(
+                Document(
+                    id=item["doc_id"],
+                    filename=item["filename"],
+                    file_hash=file_hash,
+                    status="uploaded",
+                    doc_type=doc_type,
+                    target_doc_id=target_doc_id or "",
+                    source_path=input_path,
+                    result_path="",
+                    project_id=project_id or "",
+                )
+            )
+            signatures.append(
+                celery_app.signature(
+                    "parse_task",
+                    args=[input_path, item["doc_id"], doc_type, target_doc_id],
+                    kwargs=task_kwargs,
+                    queue="parse_task",
+                )
+            )
+            if doc_type == "textbook":
+                signatures.append(
+                    celery_app.signature(
+                        "toc_precheck", args=[item["doc_id"], input_path], kwargs=task_kwargs, queue="analyze_task"
+                    )
+                )
+            items.append({"filename": item["filename"], "doc_id": item["doc_id"], "dedup": False})
+
+        doc_ids = list(dict.fromkeys(entry["doc_id"] for entry in items))
+        session.add_all(new_docs)
+        session.add(UploadBatch(id=batch_id, total=len(doc_ids), doc_ids_json=json.dumps(doc_ids)))
+
+    if signatures:
+        group(signatures).apply_async()
+    return {
+        "batch_id": batch_id,
+        "total": len(doc_ids),
+        "queued": len(new_docs),
+        "dedup": sum(1 for entry in items if entry["dedup"]),
+        "items": items,
+    }
+
+
+@app.get("/api/batch/{batch_id}")
+def batch_status(batch_id: str):
+    with session_scope(app.state.session_factory) as session:
+        batch = session.query(UploadBatch).filter(UploadBatch.id == batch_id).first()
+        if not batch:
+            raise HTTPException(status_code=404, detail="批次不存在")
+        doc_ids = json.loads(batch.doc_ids_json or "[]")
+        counts: Dict[str, int] = {}
+        for i in range(0, len(doc_ids), 500):
+            rows = (
+                session.query(Document.status, func.count(Document.id))
+                .filter(Document.id.in_(doc_ids[i : i + 500]))
+                .group_by(Document.status)
+                .all()
+            )
+            for status, count in rows:
+                counts[status] = counts.get(status, 0) + count
+        finished = sum(counts.get(s, 0) for s in ("completed", "completed_with_errors", "failed"))
+        return {
+            "batch_id": batch.id,
+            "total": batch.total,
+            "status_counts": counts,
+            "finished": finished,
+            "failed": counts.get("failed", 0),
+            "progress": round(finished / batch.total, 4) if batch.total else 1.0,
+            "created_at": batch.created_at,
+        }
+
+
+@app.post("/api/upload/precheck")
+def upload_precheck(payload: UploadPrecheck):
+    with session_scope(app.state.session_factory) as session:
+        existing = _find_by_hash(session, payload.file_hash.lower())
+        if existing:
+            return {"exists": True, **_dedup_response(existing)}
+    return {"exists": False}
+
+
+@app.post("/api/upload/init")
+def upload_init(payload: UploadInit):
+    if payload.file_hash:
+        with session_scope(app.state.session_factory) as session:
+            existing = _find_by_hash(session, payload.file_hash.lower())
+            if existing:
+                return {"exists": True, **_dedup_response(existing)}
+
+    meta = app.state.uploads.init(
+        payload.filename,
+        payload.size,
+        file_hash=(payload.file_hash or "").lower(),
+        doc_type=payload.doc_type,
+        target_doc_id=payload.target_doc_id,
+        project_id=payload.project_id,
+    )
+    return {"exists": False, "upload_id": meta["upload_id"], "offset": meta["offset"], "size": meta["size"]}
+
+
+@app.get("/api/upload/{upload_id}")
+def upload_status(upload_id: str):
+    try:
+        meta = app.state.uploads.status(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    return {"upload_id": upload_id, "offset": meta["offset"], "size": meta["size"]}
+
+
+@app.put("/api/upload/{upload_id}")
+async def upload_append(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    data = await request.body()
+    try:
+        new_offset = await run_in_threadpool(app.state.uploads.append, upload_id, offset, data)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except UploadOffsetMismatch as exc:
+        # 客户端据此从服务端偏移处续传
+        raise HTTPException(status_code=409, detail={"message": "偏移量不一致", "offset": exc.offset})
+    except UploadSizeExceeded:
+        raise HTTPException(status_code=400, detail="数据超出声明的文件大小")
+    return {"upload_id": upload_id, "offset": new_offset}
+
+
+@app.post("/api/upload/{upload_id}/complete")
+def upload_complete(upload_id: str):
+    uploads = app.state.uploads
+    try:
+        meta, part_path, file_hash = uploads.complete(upload_id)
+    except UploadNotFound:
+        raise HTTPException(status_code=404, detail="上传会话不存在或已过期")
+    except UploadOffsetMismatch as exc:
+        raise HTTPException(status_code=409, detail={"message": "文件尚未传完", "offset": exc.offset})
+
+    if meta.get("file_hash") and meta["file_hash"] != file_hash:
+        uploads.discard(upload_id)
+        raise HTTPException(status_code=400, detail="文件哈希校验失败，请重新上传")
+
+    with session_scope(app.state.session_factory) as session:
+        existing = _find_by_hash(session, file_hash)
+        if existing:
+            uploads.discard(upload_id)
+            return _dedup_response(existing)
+
+    doc_id = str(uuid.uuid4())
+    doc_dir = Path(load_config().storage.base_path) / doc_id
+    doc_dir.mkdir(parents=True, exist_ok=True)
+    input_path = doc_dir / meta["filename"]
+    shutil.move(str(part_path), str(input_path))
+    uploads.discard(upload_id)
+    return _register_document(
+        doc_id,
+        meta["filename"],
+        file_hash,
+        input_path,
+        meta.get("doc_type") or "textbook",
+        meta.get("target_doc_id"),
+        meta.get("project_id"),
+    )
+
+
 @app.get("/api/tasks/{task_id}/status")
 def task_status_placeholder(task_id: str):
     result = celery_app.AsyncResult(task_id)
@@ -179,16 +589,152 @@ def document_status(doc_id: str):
             "status": doc.status,
             "last_step": doc.last_step,
             "error_message": doc.error_message,
+            "progress": json.loads(doc.progress_json) if doc.progress_json else None,
             "updated_at": doc.updated_at,
         }
 
 
+def _doc_snapshots(doc_ids: list[str]) -> Dict[str, Dict[str, Any]]:
+    snapshots: Dict[str, Dict[str, Any]] = {}
+    with session_scope(app.state.session_factory) as session:
+        for i in range(0, len(doc_ids), 500):
+            for d in session.query(Document).filter(Document.id.in_(doc_ids[i : i + 500])):
+                snapshots[d.id] = {
+                    "doc_id": d.id,
+                    "status": d.status,
+                    "last_step": d.last_step,
+                    "error_message": d.error_message,
+                    "progress": json.loads(d.progress_json) if d.progress_json else None,
+                    "updated_at": d.updated_at,
+                }
+    # Redis 快照带有节点级进度，覆盖在库内状态之上
+    for doc_id, snapshot in app.state.progress_hub.snapshots(doc_ids).items():
+        if doc_id in snapshots:
+            snapshots[doc_id].update(snapshot)
+    return snapshots
+
+
+def _progress_response(
+    request: Request,
+    doc_ids: list[str],
+    queue: asyncio.Queue,
+    snapshot: Any,
+    pending: set[str],
+) -> StreamingResponse:
+    async def events():
+        try:
+            yield _sse("snapshot", snapshot)
+            while pending:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    # 心跳防止代理断开空闲连接
+                    yield ": ping\n\n"
+                    continue
+                yield _sse("progress", event)
+                if is_terminal(event):
+                    pending.discard(event.get("doc_id"))
+            yield _sse("end", {"doc_ids": doc_ids})
+        finally:
+            app.state.progress_hub.unsubscribe(doc_ids, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/doc/{doc_id}/events")
+async def document_events(doc_id: str, request: Request):
+    hub = app.state.progress_hub
+    # 先订阅再读快照，避免两者之间的事件丢失
+    queue = hub.subscribe([doc_id])
+    try:
+        snapshots = await run_in_threadpool(_doc_snapshots, [doc_id])
+    except Exception:
+        hub.unsubscribe([doc_id], queue)
+        raise
+    if doc_id not in snapshots:
+        hub.unsubscribe([doc_id], queue)
+        raise HTTPException(status_code=404, detail="文档不存在")
+    snapshot = snapshots[doc_id]
+    pending = set() if is_terminal(snapshot) else {doc_id}
+    return _progress_response(request, [doc_id], queue, snapshot, pending)
+
+
+def _batch_doc_ids(batch_id: str) -> tuple[int, list[str]] | None:
+    with session_scope(app.state.session_factory) as session:
+        batch = session.query(UploadBatch).filter(UploadBatch.id == batch_id).first()
+        if not batch:
+            return None
+        return batch.total, json.loads(batch.doc_ids_json or "[]")
+
+
+@app.get("/api/batch/{batch_id}/events")
+async def batch_events(batch_id: str, request: Request):
+    found = await run_in_threadpool(_batch_doc_ids, batch_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="批次不存在")
+    total, doc_ids = found
+    hub = app.state.progress_hub
+    queue = hub.subscribe(doc_ids)
+    try:
+        snapshots = await run_in_threadpool(_doc_snapshots, doc_ids)
+    except Exception:
+        hub.unsubscribe(doc_ids, queue)
+        raise
+    pending = {d for d, snap in snapshots.items() if not is_terminal(snap)}
+    snapshot = {"batch_id": batch_id, "total": total, "docs": list(snapshots.values())}
+    return _progress_response(request, doc_ids, queue, snapshot, pending)
+
+
+def _encode_cursor(created_at: dt.datetime, doc_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), doc_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> tuple[dt.datetime, str]:
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return dt.datetime.fromisoformat(created_at), str(doc_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
 @app.get("/api/docs")
-def list_documents():
-    config = app.state.config
-    base_path = Path(config.storage.base_path)
+def list_documents(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = None,
+    status: str | None = None,
+    doc_type: str | None = None,
+):
+    # 未传 limit/cursor 时保持旧行为返回全部文档，分页需显式开启
+    if limit is None and cursor:
+        limit = 100
     with session_scope(app.state.session_factory) as session:
-        docs = session.query(Document).order_by(Document.created_at.desc()).all()
+        query = session.query(Document)
+        if status:
+            query = query.filter(Document.status == status)
+        if doc_type:
+            query = query.filter(Document.doc_type == doc_type)
+        if cursor:
+            # 键集分页：(created_at, id) 严格小于上一页最后一行
+            cursor_at, cursor_id = _decode_cursor(cursor)
+            query = query.filter(
+                or_(
+                    Document.created_at < cursor_at,
+                    and_(Document.created_at == cursor_at, Document.id < cursor_id),
+                )
+            )
+        query = query.order_by(Document.created_at.desc(), Document.id.desc())
+        docs = query.limit(limit + 1).all() if limit is not None else query.all()
+        if limit is not None and len(docs) > limit:
+            docs = docs[:limit]
+            response.headers["X-Next-Cursor"] = _encode_cursor(docs[-1].created_at, docs[-1].id)
         return [
             {
                 "doc_id": d.id,
@@ -199,7 +745,7 @@ def list_documents():
                 "updated_at": d.updated_at,
                 "last_step": d.last_step,
                 "error_message": d.error_message,
-                "has_tree": (base_path / d.id / "knowledge_tree.json").exists(),
+                "has_tree": bool(d.has_tree),
             }
             for d in docs
         ]
@@ -207,7 +753,7 @@ def list_documents():
 
 @app.delete("/api/doc/{doc_id}")
 def delete_document(doc_id: str):
-    config = app.state.config
+    config = load_config()
     base_path = Path(config.storage.base_path)
     doc_dir = base_path / doc_id
     with session_scope(app.state.session_factory) as session:
@@ -215,36 +761,131 @@ def delete_document(doc_id: str):
         if not doc:
             raise HTTPException(status_code=404, detail="文档不存在")
         session.delete(doc)
+    app.state.tree_store.delete(doc_id)
     shutil.rmtree(doc_dir, ignore_errors=True)
     return {"doc_id": doc_id, "status": "deleted"}
 
 
 @app.get("/api/doc/{doc_id}/tree")
-def get_tree_placeholder(doc_id: str):
-    config = app.state.config
+def get_tree_placeholder(
+    doc_id: str,
+    request: Request,
+    node_id: str | None = None,
+    depth: int | None = None,
+    fields: str | None = None,
+):
+    config = load_config()
     tree_path = Path(config.storage.base_path) / doc_id / "knowledge_tree.json"
-    if tree_path.exists():
-        import json
+    if node_id is not None or depth is not None or fields is not None:
+        return _get_partial_tree(doc_id, tree_path, request, node_id, depth, fields)
 
-        return {"doc_id": doc_id, "tree": json.loads(tree_path.read_text(encoding="utf-8"))}
-    return {"doc_id": doc_id, "tree": None}
+    entry = app.state.tree_cache.get(doc_id, tree_path)
+    if entry is None:
+        return {"doc_id": doc_id, "tree": None}
+
+    headers = {"ETag": entry.etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    encoding, body = entry.select(request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def _partial_tree_etag(index, params: str) -> str:
+    return f'W/"{index.signature[0]}-{index.signature[1]}-{hashlib.sha1(params.encode("utf-8")).hexdigest()[:16]}"'
+
+
+def _get_partial_tree(
+    doc_id: str,
+    tree_path: Path,
+    request: Request,
+    node_id: str | None,
+    depth: int | None,
+    fields: str | None,
+):
+    if depth is not None and depth < 0:
+        raise HTTPException(status_code=400, detail="depth 不能为负数")
+    index = app.state.tree_index.get(doc_id, tree_path)
+    if index is None:
+        return {"doc_id": doc_id, "tree": None}
+    if node_id is not None and node_id not in index.nodes:
+        raise HTTPException(status_code=404, detail="节点不存在")
+
+    field_set = {f.strip() for f in fields.split(",") if f.strip()} if fields else None
+    params = f"{node_id}|{depth}|{','.join(sorted(field_set)) if field_set else ''}"
+    etag = _partial_tree_etag(index, params)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        nodes = index.subtree(node_id, depth, field_set)
+    except StaleTreeIndexError:
+        # 节点文件已被并发重建或清理，强制重建后重试一次
+        index = app.state.tree_index.get(doc_id, tree_path, rebuild=True)
+        if index is None:
+            return {"doc_id": doc_id, "tree": None}
+        if node_id is not None and node_id not in index.nodes:
+            raise HTTPException(status_code=404, detail="节点不存在")
+        nodes = index.subtree(node_id, depth, field_set)
+        headers["ETag"] = _partial_tree_etag(index, params)
+
+    tree: Dict[str, Any] = {"doc_id": doc_id, "nodes": nodes}
+    if node_id is None and field_set is None:
+        tree = {**index.meta, **tree}
+    body = json.dumps({"doc_id": doc_id, "tree": tree}, ensure_ascii=False, separators=(",", ":"))
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.post("/api/doc/{doc_id}/node/{node_id}/regenerate")
 def regenerate_node_placeholder(doc_id: str, node_id: str):
-    task = celery_app.send_task("analyze_task", args=[doc_id, node_id], queue="analyze_task")
+    with session_scope(app.state.session_factory) as session:
+        doc = session.query(Document).filter(Document.id == doc_id).first()
+        if not doc:
+            raise HTTPException(status_code=404, detail="文档不存在")
+        task_kwargs = _task_kwargs(doc.project_id)
+    task = celery_app.send_task(
+        "regenerate_node_task", args=[doc_id, node_id], kwargs=task_kwargs, queue="analyze_task"
+    )
     return {"doc_id": doc_id, "node_id": node_id, "task_id": task.id, "status": "queued"}
 
 
 @app.put("/api/doc/{doc_id}/tree/structure")
 def update_tree_structure_placeholder(doc_id: str, payload: TreePayload):
-    config = app.state.config
+    config = load_config()
     tree_path = Path(config.storage.base_path) / doc_id / "knowledge_tree.json"
-    tree_path.write_text(
-        payload.model_dump_json(indent=2, ensure_ascii=False),
-        encoding="utf-8",
-    )
-    return {"doc_id": doc_id, "status": "updated", "path": str(tree_path)}
+    tree_store = app.state.tree_store
+    tree_store.ensure_imported(doc_id, tree_path)
+    try:
+        version = tree_store.save_tree(doc_id, payload.data, payload.version)
+    except TreeVersionConflict as exc:
+        raise HTTPException(status_code=409, detail={"message": "知识树已被他人修改，请刷新后重试", "version": exc.version})
+    tree_store.materialize(doc_id, tree_path)
+    app.state.tree_cache.invalidate(doc_id)
+    with session_scope(app.state.session_factory) as session:
+        session.query(Document).filter(Document.id == doc_id).update({Document.has_tree: True})
+    return {"doc_id": doc_id, "status": "updated", "path": str(tree_path), "version": version}
+
+
+@app.patch("/api/doc/{doc_id}/node/{node_id}")
+def update_tree_node(doc_id: str, node_id: str, payload: NodePatch):
+    config = load_config()
+    tree_path = Path(config.storage.base_path) / doc_id / "knowledge_tree.json"
+    tree_store = app.state.tree_store
+    if not tree_store.ensure_imported(doc_id, tree_path):
+        raise HTTPException(status_code=404, detail="知识树不存在")
+    try:
+        node = tree_store.update_node(doc_id, node_id, payload.fields, payload.version)
+    except NodeNotFound:
+        raise HTTPException(status_code=404, detail="节点不存在")
+    except TreeVersionConflict as exc:
+        raise HTTPException(status_code=409, detail={"message": "节点已被他人修改，请刷新后重试", "version": exc.version})
+    # 写入时即重建快照，读接口只读文件、不再查询脏标记
+    tree_store.materialize(doc_id, tree_path)
+    app.state.tree_cache.invalidate(doc_id)
+    node.pop("children", None)
+    return {"doc_id": doc_id, "node": node}
 
 
 @app.post("/api/doc/{doc_id}/resume")
@@ -257,18 +898,23 @@ def resume_document(doc_id: str):
         if not doc.source_path:
             raise HTTPException(status_code=400, detail="缺少原始文件路径，无法恢复")
 
+        task_kwargs = _task_kwargs(doc.project_id)
+
         if doc.last_step == "parse":
             task = celery_app.send_task(
                 "parse_task",
                 args=[doc.source_path, doc.id, doc.doc_type, doc.target_doc_id],
+                kwargs=task_kwargs,
                 queue="parse_task",
             )
             return {"doc_id": doc.id, "task_id": task.id, "status": "requeued", "step": "parse"}
         if doc.last_step == "analyze":
-            task = celery_app.send_task("analyze_task", args=[doc.id], queue="analyze_task")
+            task = celery_app.send_task("analyze_task", args=[doc.id], kwargs=task_kwargs, queue="analyze_task")
             return {"doc_id": doc.id, "task_id": task.id, "status": "requeued", "step": "analyze"}
         if doc.last_step == "workbook_bind":
-            task = celery_app.send_task("workbook_task", args=[doc.id, doc.target_doc_id], queue="analyze_task")
+            task = celery_app.send_task(
+                "workbook_task", args=[doc.id, doc.target_doc_id], kwargs=task_kwargs, queue="analyze_task"
+            )
             return {"doc_id": doc.id, "task_id": task.id, "status": "requeued", "step": "workbook_bind"}
 
         # 若无 last_step 记录但未完成，默认重新走解析
@@ -276,6 +922,7 @@ def resume_document(doc_id: str):
             task = celery_app.send_task(
                 "parse_task",
                 args=[doc.source_path, doc.id, doc.doc_type, doc.target_doc_id],
+                kwargs=task_kwargs,
                 queue="parse_task",
             )
             return {"doc_id": doc.id, "task_id": task.id, "status": "requeued", "step": "parse"}
@@ -283,18 +930,92 @@ def resume_document(doc_id: str):
         raise HTTPException(status_code=400, detail="当前状态不可恢复或缺少步骤信息")
 
 
+def _embed_query(query: str) -> list[float]:
+    embed_cfg = load_config().models.embedding
+
+    def compute(text: str) -> list[float]:
+        with observe(EMBEDDING_LATENCY, "gateway"):
+            vectors = embed_texts(embed_cfg.base_url, embed_cfg.api_key, embed_cfg.model_name, [text])
+        return vectors[0] if vectors else []
+
+    cache = app.state.embedding_cache
+    if cache is None:
+        return compute(query)
+    return cache.get_or_compute(embed_cfg.model_name, query, compute)
+
+
+def _retrieval_params(payload: ChatQuery) -> tuple:
+    # 所有影响命中集合的检索参数（取回退后的生效值），同时作为答案缓存的键
+    rag_cfg = load_config().rag
+    return (payload.mode, payload.top_k or rag_cfg.top_k, rag_cfg.rrf_k, rag_cfg.nprobes, rag_cfg.refine_factor)
+
+
+def _retrieve(payload: ChatQuery, embedding: list[float], params: tuple) -> list[Dict[str, Any]]:
+    mode, top_k, rrf_k, nprobes, refine_factor = params
+    return search_lancedb(
+        app.state.lancedb,
+        embedding,
+        payload.doc_ids,
+        top_k,
+        mode=mode,
+        query_text=payload.query,
+        rrf_k=rrf_k,
+        nprobes=nprobes,
+        refine_factor=refine_factor,
+    )
+
+
+def _strip_vectors(results: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
+    return [{k: v for k, v in r.items() if k != "vector"} for r in results]
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
 @app.post("/api/chat/query")
 def chat_query(payload: ChatQuery):
-    config = app.state.config
-    embed_cfg = config.models.embedding
-    vectors = embed_texts(
-        embed_cfg.base_url,
-        embed_cfg.api_key,
-        embed_cfg.model_name,
-        [payload.query],
-    )
-    embedding = vectors[0] if vectors else []
-    top_k = payload.top_k or config.rag.top_k
-    results = search_lancedb(app.state.lancedb, embedding, payload.doc_ids, top_k)
-    answer = generate_answer(payload.query, results, config.model_dump())
+    # 纯全文检索无需向量，同时也不走语义缓存
+    embedding = _embed_query(payload.query) if payload.mode != "fts" else []
+    answer_cache = app.state.answer_cache
+    params = _retrieval_params(payload)
+    if answer_cache is not None:
+        cached = answer_cache.lookup(embedding, payload.doc_ids, params)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+    results = _strip_vectors(_retrieve(payload, embedding, params))
+    answer = generate_answer(payload.query, results, load_config().model_dump())
+    if answer_cache is not None:
+        answer_cache.store(embedding, payload.doc_ids, params, {"answer": answer, "hits": results})
     return {"answer": answer, "hits": results}
+
+
+@app.post("/api/chat/query/stream")
+def chat_query_stream(payload: ChatQuery):
+    def events():
+        try:
+            embedding = _embed_query(payload.query) if payload.mode != "fts" else []
+            answer_cache = app.state.answer_cache
+            params = _retrieval_params(payload)
+            cached = answer_cache.lookup(embedding, payload.doc_ids, params) if answer_cache else None
+            if cached is not None:
+                yield _sse("hits", cached["hits"])
+                yield _sse("done", cached["answer"])
+                return
+
+            results = _strip_vectors(_retrieve(payload, embedding, params))
+            # 检索结果先行下发，向量字段体积大且前端不需要
+            yield _sse("hits", results)
+            for event, data in stream_answer(payload.query, results, load_config().model_dump()):
+                if event == "done" and answer_cache is not None:
+                    answer_cache.store(embedding, payload.doc_ids, params, {"answer": data, "hits": results})
+                yield _sse(event, data)
+        except Exception as exc:
+            yield _sse("error", {"message": str(exc)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import requests
+
+INFLIGHT_PREFIX = "edu:mineru:inflight:"
+
+_pools: Dict[Tuple[int, Tuple[str, ...]], "EndpointPool"] = {}
+_pools_lock = threading.Lock()
+
+
+class _Endpoint:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.healthy = True
+        self.failures = 0
+        self.open_until = 0.0
+        self.inflight = 0
+
+
+class EndpointPool:
+    def __init__(
+        self,
+        urls: Iterable[str],
+        health_path: str = "/docs",
+        probe_interval_s: float = 15.0,
+        failure_threshold: int = 3,
+        cooldown_s: float = 60.0,
+        lease_ttl_s: float = 7200.0,
+    ) -> None:
+        self.endpoints = {url: _Endpoint(url) for url in urls}
+        self.health_path = health_path
+        self.probe_interval_s = probe_interval_s
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_s = cooldown_s
+        self.lease_ttl_s = lease_ttl_s
+        self._lock = threading.Lock()
+        self._prober: threading.Thread | None = None
+        self._client = None
+        self._client_failed_at = 0.0
+
+    def _redis(self):
+        # 在途数需在多个 Worker 进程间共享；Redis 不可用时退回进程内计数
+        if self._client is None and time.time() - self._client_failed_at > 30:
+            try:
+                import redis
+
+                client = redis.Redis.from_url(
+                    os.getenv("REDIS_URL", "redis://localhost:6379/0"), socket_timeout=0.5, socket_connect_timeout=0.5
+                )
+                client.ping()
+                self._client = client
+            except Exception:
+                self._client_failed_at = time.time()
+        return self._client
+
+    def _inflight_counts(self, urls: List[str]) -> Dict[str, int]:
+        client = self._redis()
+        if client is not None:
+            try:
+                now = time.time()
+                pipe = client.pipeline(transaction=False)
+                for url in urls:
+                    pipe.zcount(INFLIGHT_PREFIX + url, now, "+inf")
+                return dict(zip(urls, pipe.execute()))
+            except Exception:
+                self._client = None
+        return {url: self.endpoints[url].inflight for url in urls}
+
+    def _candidates(self, exclude: Iterable[str]) -> List[str]:
+        excluded = set(exclude)
+        now = time.time()
+        with self._lock:
+            remaining = [ep for url, ep in self.endpoints.items() if url not in excluded]
+            ready = [ep.url for ep in remaining if ep.healthy and ep.open_until <= now]
+        # 探活或熔断可能误判，全部不可用时仍在剩余实例中挑选，避免直接失败
+        return ready or [ep.url for ep in remaining]
+
+    def acquire(self, exclude: Iterable[str] = ()) -> Optional[Tuple[str, str]]:
+        self._ensure_prober()
+        candidates = self._candidates(exclude)
+        if not candidates:
+            return None
+        counts = self._inflight_counts(candidates) if len(candidates) > 1 else {}
+        url = min(candidates, key=lambda item: counts.get(item, 0))
+        lease_id = uuid.uuid4().hex
+        with self._lock:
+            self.endpoints[url].inflight += 1
+        client = self._redis()
+        if client is not None:
+            try:
+                # 以过期时间作为分值，Worker 异常退出时租约会自然失效
+                client.zadd(INFLIGHT_PREFIX + url, {lease_id: time.time() + self.lease_ttl_s})
+                client.zremrangebyscore(INFLIGHT_PREFIX + url, "-inf", time.time())
+            except Exception:
+                self._client = None
+        return url, lease_id
+
+    def release(self, url: str, lease_id: str, ok: bool | None) -> None:
+        # ok=None 只归还租约，不影响熔断计数
+        with self._lock:
+            endpoint = self.endpoints.get(url)
+            if endpoint is None:
+                return
+            endpoint.inflight = max(0, endpoint.inflight - 1)
+            if ok:
+                endpoint.failures = 0
+                endpoint.open_until = 0.0
+            elif ok is False:
+                endpoint.failures += 1
+                if endpoint.failures >= self.failure_threshold:
+                    endpoint.open_until = time.time() + self.cooldown_s
+        client = self._redis()
+        if client is not None:
+            try:
+                client.zrem(INFLIGHT_PREFIX + url, lease_id)
+            except Exception:
+                self._client = None
+
+    def probe(self) -> None:
+        for endpoint in list(self.endpoints.values()):
+            try:
+                response = requests.get(f"{endpoint.url}{self.health_path}", timeout=3)
+                healthy = response.status_code < 500
+            except requests.exceptions.RequestException:
+                healthy = False
+            with self._lock:
+                endpoint.healthy = healthy
+
+    def _ensure_prober(self) -> None:
+        if len(self.endpoints) < 2 or self.probe_interval_s <= 0:
+            return
+        if self._prober is not None and self._prober.is_alive():
+            return
+        with self._lock:
+            if self._prober is not None and self._prober.is_alive():
+                return
+
+            def run() -> None:
+                while True:
+                    self.probe()
+                    time.sleep(self.probe_interval_s)
+
+            self._prober = threading.Thread(target=run, name="mineru-endpoint-probe", daemon=True)
+            self._prober.start()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        counts = self._inflight_counts(list(self.endpoints))
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "url": ep.url,
+                    "healthy": ep.healthy,
+                    "failures": ep.failures,
+                    "circuit_open": ep.open_until > now,
+                    "inflight": counts.get(ep.url, ep.inflight),
+                }
+                for ep in self.endpoints.values()
+            ]
+
+
+def get_endpoint_pool(config: Mapping[str, Any]) -> EndpointPool:
+    mineru_cfg = config.get("mineru", {})
+    urls = [str(url).rstrip("/") for url in mineru_cfg.get("api_endpoints") or [] if url]
+    if not urls:
+        urls = [str(mineru_cfg.get("api_base_url", "http://localhost:8002")).rstrip("/")]
+    # 探活线程不能跨 fork 复用，prefork 子进程各自维护一份实例状态
+    key = (os.getpid(), tuple(urls))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = EndpointPool(
+                    urls,
+                    health_path=str(mineru_cfg.get("api_health_path", "/docs")),
+                    probe_interval_s=float(mineru_cfg.get("api_health_interval_s", 15)),
+                    failure_threshold=int(mineru_cfg.get("api_breaker_failures", 3)),
+                    cooldown_s=float(mineru_cfg.get("api_breaker_cooldown_s", 60)),
+                    lease_ttl_s=float(mineru_cfg.get("api_timeout_s", 3600)) + float(mineru_cfg.get("api_connect_timeout_s", 30)),
+                )
+                _pools[key] = pool
+    return pool
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        dst.unlink()
+    try:
+        # 同一文件系统下硬链接不占额外空间；跨盘时退回复制
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def iter_parse_outputs(output_dir: Path) -> Iterator[Path]:
+    # 只认 MinerU 的产物，分析阶段写入的文件不进入缓存
+    middle_json = output_dir / "middle.json"
+    if middle_json.is_file():
+        yield middle_json
+    yield from sorted(output_dir.glob("*.md"))
+    images_dir = output_dir / "images"
+    if images_dir.is_dir():
+        yield from sorted(path for path in images_dir.rglob("*") if path.is_file())
+
+
+def clear_parse_outputs(output_dir: Path) -> None:
+    # 输出文件可能是缓存条目的硬链接，重新解析前先解除，避免原地覆盖写坏缓存
+    for path in list(iter_parse_outputs(output_dir)):
+        path.unlink(missing_ok=True)
+
+
+class ParseCache:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    @staticmethod
+    def make_key(file_hash: str, api_params: Mapping[str, Any], version: str) -> str:
+        # 所有 api_params 都可能影响输出（含项目级覆盖），整体参与哈希
+        params = json.dumps(api_params, sort_keys=True, ensure_ascii=False, default=dict)
+        raw = "\x00".join([file_hash.lower(), params, version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def restore(self, key: str, output_dir: Path) -> Optional[Dict[str, Any]]:
+        entry = self._entry_dir(key)
+        manifest_path = entry / MANIFEST_NAME
+        if not manifest_path.is_file():
+            return None
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        clear_parse_outputs(output_dir)
+        for rel in manifest.get("files", []):
+            _link_or_copy(entry / rel, output_dir / rel)
+        return manifest
+
+    def store(self, key: str, output_dir: Path, meta: Mapping[str, Any]) -> bool:
+        entry = self._entry_dir(key)
+        if (entry / MANIFEST_NAME).is_file():
+            return False
+        files = [path.relative_to(output_dir).as_posix() for path in iter_parse_outputs(output_dir)]
+        if "middle.json" not in files:
+            return False
+        tmp = entry.parent / f".{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            for rel in files:
+                _link_or_copy(output_dir / rel, tmp / rel)
+            (tmp / MANIFEST_NAME).write_text(
+                json.dumps({**meta, "key": key, "files": files}, ensure_ascii=False), encoding="utf-8"
+            )
+            # 整个目录原子改名，并发写入同一条目时后到者直接放弃
+            os.rename(tmp, entry)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+        return True
+
+
+def get_parse_cache(config: Mapping[str, Any]) -> Optional[ParseCache]:
+    mineru_cfg = config.get("mineru", {})
+    if not mineru_cfg.get("parse_cache", False) or mineru_cfg.get("mode", "api") != "api":
+        return None
+    return ParseCache(Path(config["storage"]["parse_cache_path"]))
@@ -1,72 +1,51 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
 import shlex
 import subprocess
-import sqlite3
 import zipfile
 import time
 import base64
 import shutil
+import sqlite3
+import tempfile
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Mapping
 
-import yaml
+import ijson
 import requests
-from celery import Celery
+from celery import Celery, chord
 from dotenv import load_dotenv
 
+from services.common.config import get_config
+from services.common.metrics import (
+    FAILURES,
+    PARSE_SECONDS_PER_PAGE,
+    RETRIES,
+    STAGE_LATENCY,
+    install_celery_metrics,
+    observe,
+)
+from services.common.progress import publish_progress
+from services.common.status_store import get_status_store
 
-def load_config() -> Dict[str, Any]:
-    config_path = os.getenv("CONFIG_PATH", "./config/config.yaml")
-    data = yaml.safe_load(Path(config_path).read_text(encoding="utf-8")) or {}
-    data = _resolve_env(data)
-    return _resolve_paths(data, Path(config_path))
-
-
-def _update_document_status(config: Dict[str, Any], doc_id: str, **fields: Any) -> None:
-    sqlite_path = config["storage"].get("sqlite_path", "./data/sqlite/app.db")
-    Path(sqlite_path).parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(sqlite_path)
-    try:
-        fields["updated_at"] = datetime.utcnow().isoformat()
-        columns = ", ".join([f"{key}=?" for key in fields.keys()])
-        values = list(fields.values()) + [doc_id]
-        conn.execute(f"UPDATE documents SET {columns} WHERE id=?", values)
-        conn.commit()
-    finally:
-        conn.close()
+from .endpoint_pool import get_endpoint_pool
+from .parse_cache import ParseCache, clear_parse_outputs, get_parse_cache
 
+RETRYABLE_STATUS = {502, 503, 504}
 
-def _resolve_env(value: Any) -> Any:
-    if isinstance(value, str):
-        return os.path.expandvars(value)
-    if isinstance(value, list):
-        return [_resolve_env(item) for item in value]
-    if isinstance(value, dict):
-        return {k: _resolve_env(v) for k, v in value.items()}
-    return value
 
+def load_config(overrides: Mapping[str, Any] | None = None) -> Mapping[str, Any]:
+    # 项目级覆盖项由网关随任务下发
+    return get_config(overrides=overrides)
 
-def _resolve_paths(data: Dict[str, Any], config_path: Path) -> Dict[str, Any]:
-    base_dir = config_path.resolve().parent.parent
-    storage = data.get("storage", {})
-    for key in ("base_path", "lancedb_path", "sqlite_path"):
-        if key in storage and isinstance(storage[key], str):
-            p = Path(storage[key])
-            if not p.is_absolute():
-                storage[key] = str((base_dir / p).resolve())
-    data["storage"] = storage
 
-    toc = data.get("toc", {})
-    if isinstance(toc.get("poppler_path"), str):
-        p = Path(toc["poppler_path"])
-        if not p.is_absolute():
-            toc["poppler_path"] = str((base_dir / p).resolve())
-    data["toc"] = toc
-    return data
+def _update_document_status(config: Dict[str, Any], doc_id: str, **fields: Any) -> None:
+    get_status_store(config).update(doc_id, **fields)
+    publish_progress(doc_id, **fields)
 
 
 def build_command(config: Dict[str, Any], input_path: str, output_dir: str) -> list[str]:
@@ -99,113 +78,255 @@ def _bool_to_str(value: Any) -> Any:
 
 def parse_with_api(config: Dict[str, Any], input_path: str, output_dir: Path) -> Dict[str, Any]:
     mineru_cfg = config.get("mineru", {})
-    base_url = mineru_cfg.get("api_base_url", "http://localhost:8002").rstrip("/")
     endpoint = mineru_cfg.get("api_endpoint", "/file_parse")
-    url = f"{base_url}{endpoint}"
+    pool = get_endpoint_pool(config)
 
     params = mineru_cfg.get("api_params", {})
     data: Dict[str, Any] = {}
     for key, value in params.items():
-        if isinstance(value, (list, dict)):
-            data[key] = json.dumps(value, ensure_ascii=False)
+        if isinstance(value, (list, tuple, Mapping)):
+            data[key] = json.dumps(value, ensure_ascii=False, default=dict)
         else:
             data[key] = _bool_to_str(value)
 
     if not mineru_cfg.get("api_download_output", True):
         data["output_dir"] = str(output_dir)
+    if mineru_cfg.get("api_response_zip", False):
+        # 二进制 zip 避免 base64 图片带来的体积膨胀与 JSON 解码开销
+        data.setdefault("response_format_zip", "true")
 
-    retries = int(mineru_cfg.get("api_retries", 3))
+    retries = max(1, int(mineru_cfg.get("api_retries", 3)))
     last_error: Exception | None = None
+    response = None
+    tried: set[str] = set()
     for attempt in range(1, retries + 1):
+        lease = pool.acquire(exclude=tried)
+        if lease is None:
+            # 所有实例都已失败过一轮，才退避等待后重新轮换
+            tried.clear()
+            time.sleep(5 * attempt)
+            lease = pool.acquire()
+        base_url, lease_id = lease
         try:
             with open(input_path, "rb") as f:
                 files = {"files": (Path(input_path).name, f, "application/pdf")}
                 response = requests.post(
-                    url,
+                    f"{base_url}{endpoint}",
                     data=data,
                     files=files,
+                    stream=True,
                     timeout=(
                         mineru_cfg.get("api_connect_timeout_s", 30),
                         mineru_cfg.get("api_timeout_s", 3600),
                     ),
                 )
-            last_error = None
-            break
         except requests.exceptions.RequestException as exc:
             last_error = exc
-            if attempt < retries:
-                time.sleep(5 * attempt)
-            continue
-
-    if last_error:
-        raise last_error
-
-    if response.status_code != 200:
-        raise RuntimeError(f"MinerU API error {response.status_code}: {response.text}")
-
-    payload = response.json()
-    (output_dir / "api_response.json").write_text(
-        json.dumps(payload, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
-
-    filename_key = Path(input_path).stem
-    middle_json_str = None
-    result_data = None
-    if isinstance(payload.get("results"), dict):
-        if filename_key in payload["results"]:
-            result_data = payload["results"][filename_key]
-            middle_json_str = result_data.get("middle_json")
-        elif payload["results"]:
-            first_key = next(iter(payload["results"].keys()))
-            result_data = payload["results"][first_key]
-            middle_json_str = result_data.get("middle_json")
-
-    md_saved = False
-    if isinstance(result_data, dict):
-        md_content = result_data.get("md_content")
-        if md_content:
-            md_path = output_dir / f"{Path(input_path).stem}.md"
-            md_path.write_text(md_content, encoding="utf-8")
-            md_saved = True
-
-        images_map = result_data.get("images") or {}
-        if isinstance(images_map, dict) and images_map:
-            assets_dir = output_dir / "images"
-            tables_dir = assets_dir / "tables"
-            assets_dir.mkdir(parents=True, exist_ok=True)
-            tables_dir.mkdir(parents=True, exist_ok=True)
-            for img_name, img_b64 in images_map.items():
+        else:
+            if response.status_code not in RETRYABLE_STATUS:
+                break
+            last_error = RuntimeError(f"MinerU API error {response.status_code}: {response.text[:2000]}")
+            response.close()
+            response = None
+        # 失败的实例计入熔断，下一次尝试直接换到其它实例
+        pool.release(base_url, lease_id, ok=False)
+        tried.add(base_url)
+        if attempt < retries:
+            RETRIES.labels("mineru").inc()
+
+    if response is None:
+        FAILURES.labels("mineru").inc()
+        raise last_error or RuntimeError("MinerU API unavailable")
+
+    # 只有完整读完 200 响应才算实例健康；5xx 与传输/解析失败计入熔断，4xx 视为请求本身的问题
+    lease_ok: bool | None = False
+    try:
+        with response:
+            if 400 <= response.status_code < 500:
+                lease_ok = None
+            if response.status_code != 200:
+                FAILURES.labels("mineru").inc()
+                raise RuntimeError(f"MinerU API error {response.status_code}: {response.text[:2000]}")
+            if "zip" in response.headers.get("content-type", "").lower():
+                api_mode = "zip"
+                zip_path = _download_to_temp(response, output_dir)
                 try:
-                    img_path = assets_dir / img_name
-                    img_path.write_bytes(base64.b64decode(img_b64))
-                except Exception:
-                    continue
+                    result = _extract_api_zip(zip_path, Path(input_path).stem, output_dir)
+                finally:
+                    zip_path.unlink(missing_ok=True)
+            else:
+                # 服务端未开启 zip 输出时仍按 JSON 流式解析
+                api_mode = "json"
+                response.raw.decode_content = True
+                result = _consume_api_stream(response.raw, Path(input_path).stem, output_dir)
+            lease_ok = True
+    finally:
+        pool.release(base_url, lease_id, ok=lease_ok)
 
-    if middle_json_str:
-        try:
-            middle_json = json.loads(middle_json_str)
-        except Exception:
-            middle_json = {"pdf_info": []}
-        (output_dir / "middle.json").write_text(
-            json.dumps(middle_json, ensure_ascii=False, indent=2),
+    if mineru_cfg.get("api_debug_dump", False):
+        # 仅保留结构与标量字段，图片与大文本以落盘位置代替
+        (output_dir / "api_response.json").write_text(
+            json.dumps(result["skeleton"], ensure_ascii=False, indent=2),
             encoding="utf-8",
         )
-        if isinstance(result_data, dict) and result_data.get("images"):
+
+    middle_json = result["middle_json"]
+    if middle_json is not None:
+        if result["images"] and api_mode == "json":
             _move_table_images(middle_json, output_dir / "images", output_dir / "images" / "tables")
-        return {"api_mode": "json", "middle_json": True, "md_saved": md_saved}
+        return {
+            "api_mode": api_mode,
+            "middle_json": True,
+            "md_saved": result["md_saved"],
+            "pages": len(middle_json.get("pdf_info", [])),
+        }
 
-    return {"api_mode": "json", "middle_json": False, "md_saved": md_saved, "keys": list(payload.keys())}
+    return {"api_mode": api_mode, "middle_json": False, "md_saved": result["md_saved"], "keys": result["keys"]}
 
 
-def _move_table_images(middle_json: Dict[str, Any], assets_dir: Path, tables_dir: Path) -> None:
+def _download_to_temp(response, output_dir: Path) -> Path:
+    fd, tmp_name = tempfile.mkstemp(prefix="api_response_", suffix=".zip", dir=output_dir)
+    with os.fdopen(fd, "wb") as f:
+        for chunk in response.iter_content(chunk_size=1024 * 1024):
+            if chunk:
+                f.write(chunk)
+    return Path(tmp_name)
+
+
+def _table_image_names(middle_json: Dict[str, Any]) -> set[str]:
     table_images: set[str] = set()
     for page in middle_json.get("pdf_info", []):
         for block in page.get("para_blocks", []):
             if str(block.get("type", "")).upper() == "TABLE":
                 _extract_image_paths_from_block(block, table_images)
-    for img_name in table_images:
-        filename = Path(img_name).name
+    return {Path(name).name for name in table_images}
+
+
+def _extract_api_zip(zip_path: Path, filename_key: str, output_dir: Path) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"middle_json": None, "md_saved": False, "images": 0, "keys": [], "skeleton": {}}
+    with zipfile.ZipFile(zip_path) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        result["keys"] = [info.filename for info in members]
+        result["skeleton"] = {"members": result["keys"]}
+
+        def pick(candidates: list[zipfile.ZipInfo]) -> zipfile.ZipInfo | None:
+            # 多文件结果时优先取与上传文件同名的一项
+            for info in candidates:
+                if filename_key in info.filename:
+                    return info
+            return candidates[0] if candidates else None
+
+        middle_info = pick(
+            [i for i in members if i.filename.endswith("_middle.json") or Path(i.filename).name == "middle.json"]
+        )
+        table_images: set[str] = set()
+        if middle_info is not None:
+            with zf.open(middle_info) as f:
+                try:
+                    middle_json = json.load(f)
+                except ValueError:
+                    middle_json = {"pdf_info": []}
+            (output_dir / "middle.json").write_text(
+                json.dumps(middle_json, ensure_ascii=False, separators=(",", ":")),
+                encoding="utf-8",
+            )
+            result["middle_json"] = middle_json
+            # 先读 middle.json 确定表格图片，解压时直接落到 images/tables
+            table_images = _table_image_names(middle_json)
+
+        md_info = pick([i for i in members if i.filename.endswith(".md")])
+        if md_info is not None:
+            with zf.open(md_info) as src, (output_dir / f"{filename_key}.md").open("wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            result["md_saved"] = True
+
+        prefix = str(Path(middle_info.filename).parent) if middle_info is not None else ""
+        assets_dir = output_dir / "images"
+        tables_dir = assets_dir / "tables"
+        for info in members:
+            parts = Path(info.filename).parts
+            if "images" not in parts[:-1] or (prefix not in ("", ".") and not info.filename.startswith(prefix)):
+                continue
+            name = Path(info.filename).name
+            target_dir = tables_dir if name in table_images else assets_dir
+            target_dir.mkdir(parents=True, exist_ok=True)
+            with zf.open(info) as src, (target_dir / name).open("wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            result["images"] += 1
+    return result
+
+
+def _consume_api_stream(stream, filename_key: str, output_dir: Path) -> Dict[str, Any]:
+    # 逐事件解析响应体：base64 图片解码后立即落盘，整份响应不在内存中驻留
+    assets_dir = output_dir / "images"
+    skeleton: Dict[str, Any] = {}
+    stack: list[Any] = []
+    selected: str | None = None
+    result: Dict[str, Any] = {"middle_json": None, "md_saved": False, "images": 0, "keys": [], "skeleton": skeleton}
+
+    def record(path: tuple, value: Any) -> None:
+        node = skeleton
+        for key in path[:-1]:
+            node = node.setdefault(str(key), {})
+            if not isinstance(node, dict):
+                return
+        node[str(path[-1])] = value
+
+    for event, value in ijson.basic_parse(stream, use_float=True):
+        if event == "start_map":
+            stack.append(None)
+            continue
+        if event == "map_key":
+            stack[-1] = value
+            if len(stack) == 1:
+                result["keys"].append(value)
+            elif len(stack) == 2 and stack[0] == "results":
+                # 多文件结果时优先取与上传文件同名的一项
+                if selected is None or value == filename_key:
+                    selected = value
+            continue
+        if event in ("end_map", "end_array"):
+            stack.pop()
+            continue
+        if event == "start_array":
+            stack.append("[]")
+            continue
+        if "[]" in stack:
+            continue
+
+        path = tuple(stack)
+        in_result = len(path) >= 3 and path[0] == "results" and path[1] == selected
+        if in_result and len(path) == 4 and path[2] == "images" and event == "string":
+            (assets_dir / "tables").mkdir(parents=True, exist_ok=True)
+            try:
+                (assets_dir / Path(path[3]).name).write_bytes(base64.b64decode(value))
+                result["images"] += 1
+            except Exception:
+                continue
+            record(path, f"<{len(value)} base64 chars>")
+        elif in_result and len(path) == 3 and path[2] == "middle_json" and event == "string":
+            try:
+                middle_json = json.loads(value)
+            except Exception:
+                middle_json = {"pdf_info": []}
+            (output_dir / "middle.json").write_text(
+                json.dumps(middle_json, ensure_ascii=False, separators=(",", ":")),
+                encoding="utf-8",
+            )
+            result["middle_json"] = middle_json
+            record(path, "<middle.json>")
+        elif in_result and len(path) == 3 and path[2] == "md_content" and event == "string":
+            if value:
+                (output_dir / f"{filename_key}.md").write_text(value, encoding="utf-8")
+                result["md_saved"] = True
+            record(path, f"<{filename_key}.md>")
+        elif path:
+            record(path, value if not isinstance(value, str) or len(value) <= 2000 else f"<{len(value)} chars>")
+    return result
+
+
+def _move_table_images(middle_json: Dict[str, Any], assets_dir: Path, tables_dir: Path) -> None:
+    for filename in _table_image_names(middle_json):
         src = assets_dir / filename
         dst = tables_dir / filename
         if src.exists():
@@ -227,23 +348,192 @@ def _extract_image_paths_from_block(block: Any, collected: set[str]) -> None:
             _extract_image_paths_from_block(item, collected)
 
 
+def _pdf_page_count(input_path: str) -> int:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return 0
+    try:
+        return len(PdfReader(input_path).pages)
+    except Exception:
+        return 0
+
+
+def _plan_shards(config: Mapping[str, Any], input_path: str, output_dir: Path) -> list[Dict[str, Any]]:
+    shard_pages = int(config.get("mineru", {}).get("shard_pages", 0) or 0)
+    if shard_pages <= 0:
+        return []
+    total = _pdf_page_count(input_path)
+    if total <= shard_pages:
+        return []
+
+    shards_root = output_dir / "shards"
+    plan = [
+        {"index": index, "start": start, "end": min(start + shard_pages, total), "dir": str(shards_root / f"{index:03d}")}
+        for index, start in enumerate(range(0, total, shard_pages))
+    ]
+    plan_path = shards_root / "plan.json"
+    # 切分方案未变时保留已完成的分片，重试只补跑失败的部分
+    if plan_path.exists() and json.loads(plan_path.read_text(encoding="utf-8")) != plan:
+        shutil.rmtree(shards_root, ignore_errors=True)
+    shards_root.mkdir(parents=True, exist_ok=True)
+
+    from pypdf import PdfReader, PdfWriter
+
+    reader = PdfReader(input_path)
+    for shard in plan:
+        shard_dir = Path(shard["dir"])
+        shard_pdf = shard_dir / "source.pdf"
+        shard["pdf"] = str(shard_pdf)
+        if (shard_dir / ".done").exists() or shard_pdf.exists():
+            continue
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        writer = PdfWriter()
+        for page_idx in range(shard["start"], shard["end"]):
+            writer.add_page(reader.pages[page_idx])
+        tmp = shard_pdf.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            writer.write(f)
+        os.replace(tmp, shard_pdf)
+    plan_path.write_text(
+        json.dumps([{k: v for k, v in shard.items() if k != "pdf"} for shard in plan], ensure_ascii=False),
+        encoding="utf-8",
+    )
+    return plan
+
+
+def _prefix_image_paths(obj: Any, prefix: str) -> None:
+    if isinstance(obj, dict):
+        image_path = obj.get("image_path")
+        if image_path:
+            obj["image_path"] = f"{prefix}{Path(image_path).name}"
+        for value in obj.values():
+            _prefix_image_paths(value, prefix)
+    elif isinstance(obj, list):
+        for item in obj:
+            _prefix_image_paths(item, prefix)
+
+
+def _merge_shards(shards: list[Dict[str, Any]], stem: str, output_dir: Path) -> Dict[str, Any]:
+    merged: Dict[str, Any] = {}
+    pdf_info: list[Any] = []
+    md_parts: list[str] = []
+    images = 0
+    for shard in sorted(shards, key=lambda item: item["start"]):
+        shard_dir = Path(shard["dir"])
+        middle_json = json.loads((shard_dir / "middle.json").read_text(encoding="utf-8"))
+        # 分片内页码从 0 开始，按分片起始页偏移；图片加分片前缀避免重名
+        prefix = f"s{shard['index']:03d}_"
+        for local_idx, page in enumerate(middle_json.get("pdf_info", [])):
+            page["page_idx"] = int(page.get("page_idx", local_idx)) + shard["start"]
+            if "page_id" in page:
+                page["page_id"] = int(page["page_id"]) + shard["start"]
+            _prefix_image_paths(page, prefix)
+            pdf_info.append(page)
+        for key, value in middle_json.items():
+            merged.setdefault(key, value)
+
+        for sub in ("", "tables"):
+            src_dir = shard_dir / "images" / sub
+            if not src_dir.is_dir():
+                continue
+            dst_dir = output_dir / "images" / sub
+            dst_dir.mkdir(parents=True, exist_ok=True)
+            for image in src_dir.iterdir():
+                if image.is_file():
+                    os.replace(image, dst_dir / f"{prefix}{image.name}")
+                    images += 1
+
+        md_files = sorted(shard_dir.glob("*.md"))
+        if md_files:
+            md_parts.append(md_files[0].read_text(encoding="utf-8").replace("](images/", f"](images/{prefix}"))
+
+    merged["pdf_info"] = pdf_info
+    (output_dir / "middle.json").write_text(
+        json.dumps(merged, ensure_ascii=False, separators=(",", ":")),
+        encoding="utf-8",
+    )
+    if md_parts:
+        (output_dir / f"{stem}.md").write_text("\n\n".join(md_parts), encoding="utf-8")
+    return {"api_mode": "sharded", "middle_json": True, "md_saved": bool(md_parts), "pages": len(pdf_info), "images": images}
+
+
 load_dotenv()
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 celery_app = Celery("edu_parser", broker=redis_url, backend=redis_url)
+install_celery_metrics(celery_app, int(os.getenv("METRICS_PORT", "9101")))
 
 
 @celery_app.task(name="parse_task")
-def parse_task(input_pdf: str, doc_id: str, doc_type: str = "textbook", target_doc_id: str | None = None) -> Dict[str, Any]:
-    config = load_config()
+def parse_task(
+    input_pdf: str,
+    doc_id: str,
+    doc_type: str = "textbook",
+    target_doc_id: str | None = None,
+    config_overrides: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    config = load_config(config_overrides)
     _update_document_status(config, doc_id, status="parsing", last_step="parse", error_message="")
     base_path = Path(config["storage"]["base_path"])
     output_dir = base_path / doc_id / config["mineru"]["output_subdir"]
     output_dir.mkdir(parents=True, exist_ok=True)
 
     mineru_mode = config.get("mineru", {}).get("mode", "api")
+    cache = get_parse_cache(config)
+    cache_key: str | None = None
+    if cache is not None:
+        # 同一文件在相同后端参数下的解析结果可直接复用，跳过 MinerU
+        try:
+            cache_key = _parse_cache_key(config, doc_id, input_pdf)
+            manifest = cache.restore(cache_key, output_dir)
+        except OSError:
+            manifest = None
+        if manifest is not None:
+            result_payload = {
+                "doc_id": doc_id,
+                "output_dir": str(output_dir),
+                "returncode": 0,
+                "stdout": json.dumps(
+                    {"api_mode": "cache", "middle_json": True, "pages": manifest.get("pages"), "cache_key": cache_key},
+                    ensure_ascii=False,
+                ),
+                "stderr": "",
+            }
+            _finish_parse(config, doc_id, result_payload, doc_type, target_doc_id, config_overrides)
+            return result_payload
+
+    if mineru_mode == "api":
+        clear_parse_outputs(output_dir)
+        try:
+            shards = _plan_shards(config, input_pdf, output_dir)
+        except Exception as exc:
+            _update_document_status(config, doc_id, status="failed", last_step="parse", error_message=str(exc))
+            raise
+        if shards:
+            # 大 PDF 按页切分后并发解析，全部分片完成后由 merge_shards_task 合并并推进后续流程
+            header = [
+                parse_shard_task.s(shard, doc_id, config_overrides=config_overrides).set(queue="parse_task")
+                for shard in shards
+            ]
+            callback = merge_shards_task.s(
+                doc_id,
+                input_pdf,
+                shards,
+                doc_type=doc_type,
+                target_doc_id=target_doc_id,
+                config_overrides=config_overrides,
+                cache_key=cache_key,
+            ).set(queue="parse_task")
+            chord(header)(callback)
+            return {"doc_id": doc_id, "output_dir": str(output_dir), "status": "sharded", "shards": len(shards)}
+
+    started = time.perf_counter()
     try:
         if mineru_mode == "api":
             api_result = parse_with_api(config, input_pdf, output_dir)
+            if api_result.get("pages"):
+                backend = str(config["mineru"].get("api_params", {}).get("backend", "api"))
+                PARSE_SECONDS_PER_PAGE.labels(backend).observe((time.perf_counter() - started) / api_result["pages"])
             result_payload = {
                 "doc_id": doc_id,
                 "output_dir": str(output_dir),
@@ -264,10 +554,73 @@ def parse_task(input_pdf: str, doc_id: str, doc_type: str = "textbook", target_d
     except Exception as exc:
         _update_document_status(config, doc_id, status="failed", last_step="parse", error_message=str(exc))
         raise
+    finally:
+        STAGE_LATENCY.labels("parse").observe(time.perf_counter() - started)
 
+    if cache is not None and cache_key and result_payload["returncode"] == 0:
+        _store_parse_cache(cache, cache_key, output_dir, doc_id, api_result)
+    _finish_parse(config, doc_id, result_payload, doc_type, target_doc_id, config_overrides)
+    return result_payload
+
+
+def _document_file_hash(config: Mapping[str, Any], doc_id: str, input_pdf: str) -> str:
+    try:
+        with get_status_store(config).connection() as conn:
+            row = conn.execute("SELECT file_hash FROM documents WHERE id=?", (doc_id,)).fetchone()
+    except sqlite3.Error:
+        row = None
+    if row and row[0]:
+        return str(row[0])
+    hasher = hashlib.sha256()
+    with open(input_pdf, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _parse_cache_key(config: Mapping[str, Any], doc_id: str, input_pdf: str) -> str:
+    mineru_cfg = config.get("mineru", {})
+    return ParseCache.make_key(
+        _document_file_hash(config, doc_id, input_pdf),
+        mineru_cfg.get("api_params", {}),
+        str(mineru_cfg.get("version", "")),
+    )
+
+
+def _store_parse_cache(
+    cache: ParseCache, cache_key: str, output_dir: Path, doc_id: str, api_result: Mapping[str, Any]
+) -> None:
+    try:
+        cache.store(
+            cache_key,
+            output_dir,
+            {"doc_id": doc_id, "pages": api_result.get("pages"), "created_at": datetime.utcnow().isoformat()},
+        )
+    except OSError:
+        # 缓存写入失败不影响本次解析结果
+        pass
+
+
+def _finish_parse(
+    config: Mapping[str, Any],
+    doc_id: str,
+    result_payload: Dict[str, Any],
+    doc_type: str,
+    target_doc_id: str | None,
+    config_overrides: Dict[str, Any] | None,
+) -> None:
     pipeline_cfg = config.get("pipeline", {})
+    next_step = ""
+    if result_payload["returncode"] == 0 and pipeline_cfg.get("auto_analyze", False):
+        if doc_type != "workbook":
+            next_step = "analyze"
+        elif pipeline_cfg.get("auto_workbook_bind", False) and target_doc_id:
+            next_step = "workbook_bind"
+
     if result_payload["returncode"] == 0:
-        _update_document_status(config, doc_id, status="parsed", last_step="parse", error_message="")
+        get_status_store(config).update(doc_id, status="parsed", last_step="parse", error_message="")
+        # next_step 告知订阅者后续任务会继续推进，此时 parsed 不是终态
+        publish_progress(doc_id, status="parsed", last_step="parse", error_message="", next_step=next_step)
     else:
         _update_document_status(
             config,
@@ -277,11 +630,82 @@ def parse_task(input_pdf: str, doc_id: str, doc_type: str = "textbook", target_d
             error_message=result_payload.get("stderr") or "parse failed",
         )
 
-    if result_payload["returncode"] == 0 and pipeline_cfg.get("auto_analyze", False):
-        if doc_type == "workbook":
-            if pipeline_cfg.get("auto_workbook_bind", False) and target_doc_id:
-                celery_app.send_task("workbook_task", args=[doc_id, target_doc_id], queue="analyze_task")
+    task_kwargs = {"config_overrides": config_overrides} if config_overrides else {}
+    if next_step == "workbook_bind":
+        celery_app.send_task("workbook_task", args=[doc_id, target_doc_id], kwargs=task_kwargs, queue="analyze_task")
+    elif next_step == "analyze":
+        celery_app.send_task("analyze_task", args=[doc_id], kwargs=task_kwargs, queue="analyze_task")
+
+
+@celery_app.task(name="parse_shard_task", bind=True)
+def parse_shard_task(
+    self,
+    shard: Dict[str, Any],
+    doc_id: str,
+    config_overrides: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    config = load_config(config_overrides)
+    shard_dir = Path(shard["dir"])
+    if (shard_dir / ".done").exists():
+        return {"index": shard["index"], "skipped": True}
+
+    # 清掉上次失败留下的半成品，只保留切分出的 source.pdf
+    for item in shard_dir.iterdir():
+        if item.name == "source.pdf":
+            continue
+        if item.is_dir():
+            shutil.rmtree(item, ignore_errors=True)
         else:
-            celery_app.send_task("analyze_task", args=[doc_id], queue="analyze_task")
+            item.unlink(missing_ok=True)
 
+    started = time.perf_counter()
+    try:
+        result = parse_with_api(config, shard["pdf"], shard_dir)
+        if not result.get("middle_json"):
+            raise RuntimeError(f"MinerU returned no middle_json for pages {shard['start']}-{shard['end']}")
+    except Exception as exc:
+        max_retries = int(config.get("mineru", {}).get("shard_retries", 2))
+        if self.request.retries < max_retries:
+            raise self.retry(exc=exc, countdown=10 * (self.request.retries + 1), max_retries=max_retries)
+        _update_document_status(config, doc_id, status="failed", last_step="parse", error_message=str(exc))
+        raise
+    if result.get("pages"):
+        backend = str(config["mineru"].get("api_params", {}).get("backend", "api"))
+        PARSE_SECONDS_PER_PAGE.labels(backend).observe((time.perf_counter() - started) / result["pages"])
+    (shard_dir / ".done").write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+    return {"index": shard["index"], "pages": result.get("pages")}
+
+
+@celery_app.task(name="merge_shards_task")
+def merge_shards_task(
+    shard_results: list[Dict[str, Any]],
+    doc_id: str,
+    input_pdf: str,
+    shards: list[Dict[str, Any]],
+    doc_type: str = "textbook",
+    target_doc_id: str | None = None,
+    config_overrides: Dict[str, Any] | None = None,
+    cache_key: str | None = None,
+) -> Dict[str, Any]:
+    config = load_config(config_overrides)
+    output_dir = Path(config["storage"]["base_path"]) / doc_id / config["mineru"]["output_subdir"]
+    try:
+        with observe(STAGE_LATENCY, "parse.merge"):
+            api_result = _merge_shards(shards, Path(input_pdf).stem, output_dir)
+    except Exception as exc:
+        _update_document_status(config, doc_id, status="failed", last_step="parse", error_message=str(exc))
+        raise
+    shutil.rmtree(output_dir / "shards", ignore_errors=True)
+    api_result["shards"] = len(shards)
+    cache = get_parse_cache(config)
+    if cache is not None and cache_key:
+        _store_parse_cache(cache, cache_key, output_dir, doc_id, api_result)
+    result_payload = {
+        "doc_id": doc_id,
+        "output_dir": str(output_dir),
+        "returncode": 0,
+        "stdout": json.dumps(api_result, ensure_ascii=False),
+        "stderr": "",
+    }
+    _finish_parse(config, doc_id, result_payload, doc_type, target_doc_id, config_overrides)
     return result_payload